@@ -1,10 +1,14 @@
 from zen_backend import create_app
 
-app = create_app()
-
 
 def main() -> None:
-	app.run(host="0.0.0.0", port=app.config.get("PORT", 5000), debug=False)
+	# Build the app here rather than at import time so importing this module
+	# (tooling, `flask --app app`, which finds create_app itself) does not
+	# initialise Firebase.
+	app = create_app()
+	# Streamed chat replies hold their connection open for the whole Gemini
+	# response, so serve each request on its own thread.
+	app.run(host="0.0.0.0", port=app.config.get("PORT", 5000), debug=False, threaded=True)
 
 
 if __name__ == "__main__":
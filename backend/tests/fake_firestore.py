@@ -0,0 +1,178 @@
+"""Minimal in-memory stand-in for the Firestore client used by route tests.
+
+Only the calls the backend makes are implemented. Every document read and
+query is recorded in ``FakeFirestore.reads`` so tests can assert what was
+touched.
+"""
+
+from __future__ import annotations
+
+from typing import Any
+import copy
+import itertools
+
+_ids = itertools.count(1)
+
+
+class FakeSnapshot:
+    def __init__(self, reference: "FakeDocument", data: dict[str, Any] | None):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self) -> dict[str, Any] | None:
+        return copy.deepcopy(self._data)
+
+
+class FakeDocument:
+    def __init__(self, db: "FakeFirestore", path: str):
+        self._db = db
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def collection(self, name: str) -> "FakeQuery":
+        return FakeQuery(self._db, f"{self.path}/{name}")
+
+    def get(self, field_paths=None, transaction=None) -> FakeSnapshot:
+        self._db.reads.append(self.path)
+        data = self._db.docs.get(self.path)
+        if data is not None and field_paths is not None:
+            data = {key: value for key, value in data.items() if key in field_paths}
+        return FakeSnapshot(self, copy.deepcopy(data))
+
+    def set(self, data: dict[str, Any], merge: bool = False) -> None:
+        stored = self._db.docs.get(self.path) if merge else None
+        self._db.docs[self.path] = {**(stored or {}), **copy.deepcopy(data)}
+
+    def update(self, data: dict[str, Any]) -> None:
+        if self.path not in self._db.docs:
+            raise KeyError(self.path)
+        self._db.docs[self.path].update(copy.deepcopy(data))
+
+    def delete(self) -> None:
+        self._db.docs.pop(self.path, None)
+
+
+class FakeQuery:
+    def __init__(self, db: "FakeFirestore", path: str):
+        self._db = db
+        self._path = path
+        self._filters: list[tuple[str, str, Any]] = []
+        self._order: tuple[str, bool] | None = None
+        self._limit: int | None = None
+        self._last: int | None = None
+        self._fields: tuple[str, ...] | None = None
+
+    def _copy(self) -> "FakeQuery":
+        clone = copy.copy(self)
+        clone._filters = list(self._filters)
+        return clone
+
+    def document(self, document_id: str | None = None) -> FakeDocument:
+        return FakeDocument(self._db, f"{self._path}/{document_id or f'auto{next(_ids)}'}")
+
+    def where(self, field: str, op: str, value: Any) -> "FakeQuery":
+        clone = self._copy()
+        clone._filters.append((field, op, value))
+        return clone
+
+    def order_by(self, field: str, direction: str = "ASCENDING") -> "FakeQuery":
+        clone = self._copy()
+        clone._order = (field, direction == "DESCENDING")
+        return clone
+
+    def limit(self, count: int) -> "FakeQuery":
+        clone = self._copy()
+        clone._limit = count
+        return clone
+
+    def limit_to_last(self, count: int) -> "FakeQuery":
+        clone = self._copy()
+        clone._last = count
+        return clone
+
+    def select(self, fields) -> "FakeQuery":
+        clone = self._copy()
+        clone._fields = tuple(fields)
+        return clone
+
+    def _matches(self, data: dict[str, Any]) -> bool:
+        for field, op, value in self._filters:
+            if op == "==" and data.get(field) != value:
+                return False
+            if op == "array_contains_any" and not set(data.get(field) or ()) & set(value):
+                return False
+        return True
+
+    def stream(self) -> list[FakeSnapshot]:
+        self._db.reads.append(self._path)
+        prefix = self._path + "/"
+        rows = [
+            (path, data)
+            for path, data in self._db.docs.items()
+            if path.startswith(prefix) and "/" not in path[len(prefix):] and self._matches(data)
+        ]
+        if self._order is not None:
+            field, descending = self._order
+            rows.sort(key=lambda row: row[1].get(field), reverse=descending)
+        if self._limit is not None:
+            rows = rows[: self._limit]
+        if self._last is not None:
+            rows = rows[-self._last:]
+        snapshots = []
+        for path, data in rows:
+            if self._fields is not None:
+                data = {key: value for key, value in data.items() if key in self._fields}
+            snapshots.append(FakeSnapshot(FakeDocument(self._db, path), copy.deepcopy(data)))
+        return snapshots
+
+    get = stream
+
+
+class FakeBatch:
+    def __init__(self, db: "FakeFirestore"):
+        self._db = db
+        self._ops: list[tuple[str, FakeDocument, dict[str, Any]]] = []
+
+    def set(self, ref: FakeDocument, data: dict[str, Any]) -> None:
+        self._ops.append(("set", ref, data))
+
+    def update(self, ref: FakeDocument, data: dict[str, Any]) -> None:
+        self._ops.append(("update", ref, data))
+
+    def commit(self) -> None:
+        for op, ref, data in self._ops:
+            getattr(ref, op)(data)
+
+
+class FakeBulkWriter:
+    def on_write_error(self, callback) -> None:
+        self._on_write_error = callback
+
+    def delete(self, ref: FakeDocument) -> None:
+        ref.delete()
+
+    def close(self) -> None:
+        pass
+
+
+class FakeFirestore:
+    def __init__(self) -> None:
+        self.docs: dict[str, dict[str, Any]] = {}
+        self.reads: list[str] = []
+
+    def collection(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def batch(self) -> FakeBatch:
+        return FakeBatch(self)
+
+    def bulk_writer(self) -> FakeBulkWriter:
+        return FakeBulkWriter()
+
+    def get_all(self, refs):
+        return [ref.get() for ref in refs]
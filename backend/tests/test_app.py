@@ -0,0 +1,50 @@
+import pytest
+
+import zen_backend
+from zen_backend.auth import tokens
+from zen_backend.config import AppConfig
+from zen_backend.json_provider import ORJSONProvider
+from zen_backend.wrappers import Request
+
+
+def _create_app(monkeypatch, tmp_path, **overrides):
+    monkeypatch.setattr(zen_backend, "init_firebase", lambda path, database_id=None: None)
+    monkeypatch.setattr(tokens, "start_certificate_refresher", lambda: pytest.fail("refresher started"))
+    config = AppConfig(
+        port=5000,
+        firebase_credentials_path=tmp_path / "credentials.json",
+        firebase_web_api_key=None,
+        gemini_api_key=None,
+        uploads_dir=tmp_path / "uploads",
+        max_inline_attachment_bytes=350000,
+        **overrides,
+    )
+    return zen_backend.create_app(config)
+
+
+def test_create_app_wires_the_json_provider_and_request_class(monkeypatch, tmp_path):
+    app = _create_app(monkeypatch, tmp_path, firestore_read_workers=4)
+
+    assert isinstance(app.json, ORJSONProvider)
+    assert app.request_class is Request
+    assert app.config["FIRESTORE_READ_WORKERS"] == 4
+    assert app.test_client().get("/health").get_json() == {"status": "ok"}
+
+
+def test_create_app_leaves_request_bodies_unlimited_by_default(monkeypatch, tmp_path):
+    app = _create_app(monkeypatch, tmp_path)
+
+    # No uid, so the route answers without touching Firestore.
+    response = app.test_client().post("/chats", json={"title": "x" * (2 * 1024 * 1024)})
+
+    assert app.config["MAX_CONTENT_LENGTH"] is None
+    assert response.status_code == 400
+
+
+def test_create_app_rejects_bodies_over_the_configured_limit_as_json(monkeypatch, tmp_path):
+    app = _create_app(monkeypatch, tmp_path, max_request_body_bytes=1024)
+
+    response = app.test_client().post("/chats", json={"title": "x" * 2048})
+
+    assert response.status_code == 413
+    assert response.get_json()["error"] == "payload_too_large"
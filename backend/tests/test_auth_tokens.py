@@ -0,0 +1,191 @@
+import time
+
+import pytest
+
+from zen_backend.auth import tokens
+
+
+@pytest.fixture(autouse=True)
+def refresher_starts(monkeypatch):
+    starts = []
+    monkeypatch.setattr(tokens, "start_certificate_refresher", lambda: starts.append(True))
+    return starts
+
+
+def test_verify_id_token_reuses_result_until_expiry(monkeypatch):
+    calls = []
+
+    def fake_verify(id_token):
+        calls.append(id_token)
+        return {"uid": "user-1", "exp": time.time() + 3600}
+
+    monkeypatch.setattr(tokens.firebase_auth, "verify_id_token", fake_verify)
+    tokens._verified_tokens.clear()
+    try:
+        first = tokens.verify_id_token("token-a")
+        second = tokens.verify_id_token("token-a")
+    finally:
+        tokens._verified_tokens.clear()
+
+    assert first["uid"] == second["uid"] == "user-1"
+    assert calls == ["token-a"]
+
+
+def test_verify_id_token_skips_cache_for_nearly_expired_tokens(monkeypatch):
+    calls = []
+
+    def fake_verify(id_token):
+        calls.append(id_token)
+        return {"uid": "user-1", "exp": time.time() + 5}
+
+    monkeypatch.setattr(tokens.firebase_auth, "verify_id_token", fake_verify)
+    tokens._verified_tokens.clear()
+    try:
+        tokens.verify_id_token("token-b")
+        tokens.verify_id_token("token-b")
+    finally:
+        tokens._verified_tokens.clear()
+
+    assert calls == ["token-b", "token-b"]
+
+
+def test_verify_id_token_checks_signature_locally(monkeypatch):
+    from types import SimpleNamespace
+
+    import jwt
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    now = int(time.time())
+    claims = {
+        "iss": "https://securetoken.google.com/zen-project",
+        "aud": "zen-project",
+        "sub": "user-1",
+        "iat": now,
+        "exp": now + 3600,
+    }
+    token = jwt.encode(claims, private_key, algorithm="RS256", headers={"kid": "key-1"})
+
+    def fail_verify(id_token):
+        raise AssertionError("Admin SDK should not be called")
+
+    monkeypatch.setattr(tokens, "_signing_keys", {"key-1": private_key.public_key()})
+    monkeypatch.setattr(tokens.firebase_admin, "get_app", lambda: SimpleNamespace(project_id="zen-project"))
+    monkeypatch.setattr(tokens.firebase_auth, "verify_id_token", fail_verify)
+    monkeypatch.delenv("FIREBASE_AUTH_EMULATOR_HOST", raising=False)
+    tokens._verified_tokens.clear()
+    try:
+        decoded = tokens.verify_id_token(token)
+    finally:
+        tokens._verified_tokens.clear()
+
+    assert decoded["uid"] == "user-1"
+
+    wrong_audience = jwt.encode({**claims, "aud": "other"}, private_key, algorithm="RS256", headers={"kid": "key-1"})
+    assert tokens._verify_locally(wrong_audience) is None
+
+
+def _self_signed_pem(private_key):
+    import datetime
+
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.x509.oid import NameOID
+
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "securetoken")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(private_key.public_key())
+        .serial_number(1)
+        .not_valid_before(now)
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(private_key, hashes.SHA256())
+    )
+    return certificate.public_bytes(serialization.Encoding.PEM).decode("ascii")
+
+
+def test_refresh_signing_certificates_fetches_the_public_endpoint(monkeypatch):
+    from types import SimpleNamespace
+
+    import orjson
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    body = orjson.dumps({"key-1": _self_signed_pem(private_key)})
+    urls = []
+
+    def fake_get(url, timeout):
+        urls.append(url)
+        return SimpleNamespace(status_code=200, content=body)
+
+    monkeypatch.setattr(tokens._http_session, "get", fake_get)
+    monkeypatch.setattr(tokens, "_signing_keys", {})
+
+    tokens.refresh_signing_certificates()
+
+    assert urls == [tokens.ID_TOKEN_CERT_URI]
+    assert tokens._signing_keys["key-1"].public_numbers() == private_key.public_key().public_numbers()
+
+
+def test_certificate_refresher_logs_first_failure_as_error(monkeypatch, caplog):
+    import logging
+
+    class Stop(Exception):
+        pass
+
+    sleeps = []
+
+    def fake_sleep(interval):
+        sleeps.append(interval)
+        if len(sleeps) == 3:
+            raise Stop
+
+    def failing_refresh():
+        raise RuntimeError("certificate fetch returned HTTP 503")
+
+    monkeypatch.setattr(tokens, "refresh_signing_certificates", failing_refresh)
+    monkeypatch.setattr(tokens.time, "sleep", fake_sleep)
+
+    with caplog.at_level(logging.WARNING, logger=tokens.log.name), pytest.raises(Stop):
+        tokens._refresh_certificates_forever(60)
+
+    assert [record.levelno for record in caplog.records] == [logging.ERROR, logging.WARNING, logging.WARNING]
+
+
+def test_verify_id_token_returns_independent_claims(monkeypatch):
+    monkeypatch.setattr(
+        tokens.firebase_auth,
+        "verify_id_token",
+        lambda id_token: {"uid": "user-1", "exp": time.time() + 3600},
+    )
+    tokens._verified_tokens.clear()
+    try:
+        first = tokens.verify_id_token("token-c")
+        first["uid"] = "someone-else"
+        second = tokens.verify_id_token("token-c")
+        second["uid"] = "another"
+        third = tokens.verify_id_token("token-c")
+    finally:
+        tokens._verified_tokens.clear()
+
+    assert third["uid"] == "user-1"
+
+
+def test_verify_id_token_starts_the_certificate_refresher_lazily(monkeypatch, refresher_starts):
+    monkeypatch.setattr(tokens, "_refresher_thread", None)
+    monkeypatch.setattr(
+        tokens.firebase_auth,
+        "verify_id_token",
+        lambda id_token: {"uid": "user-1", "exp": time.time() + 3600},
+    )
+    tokens._verified_tokens.clear()
+    try:
+        tokens.verify_id_token("token-d")
+        tokens.verify_id_token("token-d")
+    finally:
+        tokens._verified_tokens.clear()
+
+    assert refresher_starts == [True]
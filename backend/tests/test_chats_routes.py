@@ -0,0 +1,491 @@
+from concurrent.futures import Future
+from datetime import datetime, timezone
+import io
+
+import pytest
+from flask import Flask
+
+from fake_firestore import FakeBatch, FakeFirestore
+from zen_backend.ai import gemini as gemini_module
+from zen_backend.chats import routes
+from zen_backend.json_provider import ORJSONProvider
+from zen_backend.wrappers import Request
+
+CHAT_PATH = "chats/chat-1"
+
+
+class InlineExecutor:
+    """Runs submitted work immediately so Firestore reads happen in order."""
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as exc:
+            future.set_exception(exc)
+        return future
+
+
+@pytest.fixture
+def db(monkeypatch):
+    fake = FakeFirestore()
+    fake.docs[CHAT_PATH] = {
+        "uid": "owner",
+        "title": "New chat",
+        "systemPrompt": None,
+        "createdAt": datetime(2025, 1, 1, tzinfo=timezone.utc),
+        "updatedAt": datetime(2025, 1, 1, tzinfo=timezone.utc),
+    }
+    monkeypatch.setattr(routes, "get_collection", fake.collection)
+    monkeypatch.setattr(routes, "get_firestore_client", lambda: fake)
+    monkeypatch.setattr(routes, "find_notes_for_text", lambda uid, text, limit=5: [])
+    monkeypatch.setattr(routes, "_get_firestore_executor", InlineExecutor)
+    monkeypatch.setattr(routes, "_title_executor", InlineExecutor())
+    routes._file_metadata_cache.clear()
+    return fake
+
+
+@pytest.fixture
+def gemini(monkeypatch):
+    calls = {"replies": [], "titles": []}
+
+    def fake_reply(messages, api_key):
+        calls["replies"].append(messages)
+        return "Sure."
+
+    def fake_title(user_message, assistant_message, api_key):
+        calls["titles"].append(user_message)
+        return "Generated title"
+
+    monkeypatch.setattr(routes, "generate_reply", fake_reply)
+    monkeypatch.setattr(routes, "generate_chat_title", fake_title)
+    return calls
+
+
+@pytest.fixture
+def client(db, tmp_path):
+    app = Flask(__name__)
+    app.request_class = Request
+    app.json = ORJSONProvider(app)
+    app.config.update(GEMINI_API_KEY="test-key", UPLOADS_DIR=str(tmp_path))
+    app.register_blueprint(routes.chats_bp)
+    return app.test_client()
+
+
+def _send(client, content, uid="owner"):
+    return client.post(f"/{CHAT_PATH}/messages", json={"uid": uid, "content": content})
+
+
+def test_add_message_titles_a_new_chat(client, db, gemini):
+    response = _send(client, "Plan my week")
+
+    assert response.status_code == 201
+    assert gemini["titles"] == ["Plan my week"]
+    assert db.docs[CHAT_PATH]["title"] == "Generated title"
+
+
+def test_add_message_keeps_a_rename_made_elsewhere(client, db, gemini, monkeypatch):
+    # The first message leaves the default title in place.
+    monkeypatch.setattr(routes, "generate_chat_title", lambda **kwargs: None)
+    assert _send(client, "hello").status_code == 201
+    assert db.docs[CHAT_PATH]["title"] == "New chat"
+
+    # Another worker renames the chat before the next message arrives.
+    db.docs[CHAT_PATH]["title"] = "My renamed chat"
+    monkeypatch.setattr(routes, "generate_chat_title", lambda **kwargs: pytest.fail("title regenerated"))
+
+    assert _send(client, "second message").status_code == 201
+    assert db.docs[CHAT_PATH]["title"] == "My renamed chat"
+
+
+def test_add_message_uses_the_current_system_prompt(client, db, gemini):
+    assert _send(client, "first").status_code == 201
+
+    db.docs[CHAT_PATH]["systemPrompt"] = "Answer like a pirate."
+    assert _send(client, "second").status_code == 201
+
+    system_prompts = [m["content"] for m in gemini["replies"][-1] if m["role"] == "system"]
+    assert system_prompts[0] == "Answer like a pirate."
+
+
+def test_add_message_sees_a_chat_deleted_elsewhere(client, db, gemini):
+    assert _send(client, "first").status_code == 201
+
+    for path in [path for path in db.docs if path.startswith(CHAT_PATH)]:
+        del db.docs[path]
+
+    response = _send(client, "second")
+
+    assert response.status_code == 404
+    assert not any(path.startswith(CHAT_PATH) for path in db.docs)
+
+
+def test_add_message_rejects_other_users(client, db, gemini):
+    response = _send(client, "hi", uid="intruder")
+
+    assert response.status_code == 403
+    assert gemini["replies"] == []
+
+
+def _seed_history(db):
+    db.docs[f"{CHAT_PATH}/messages/m1"] = {
+        "uid": "owner",
+        "role": "user",
+        "content": "secret",
+        "createdAt": datetime(2025, 1, 2, tzinfo=timezone.utc),
+    }
+    db.docs[f"{CHAT_PATH}/files/f1"] = {
+        "uid": "owner",
+        "fileName": "notes.txt",
+        "createdAt": datetime(2025, 1, 2, tzinfo=timezone.utc),
+    }
+
+
+def test_get_chat_returns_messages_and_files(client, db):
+    _seed_history(db)
+
+    response = client.get(f"/{CHAT_PATH}?uid=owner")
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [m["content"] for m in body["messages"]] == ["secret"]
+    assert [f["fileName"] for f in body["files"]] == ["notes.txt"]
+
+
+@pytest.mark.parametrize(
+    ("path", "uid", "status"),
+    [(CHAT_PATH, "intruder", 403), ("chats/missing", "owner", 404)],
+)
+def test_get_chat_rejection_skips_subcollections(client, db, path, uid, status):
+    _seed_history(db)
+
+    response = client.get(f"/{path}?uid={uid}")
+
+    assert response.status_code == status
+    assert db.reads == [path]
+
+
+def test_add_message_survives_an_oversized_old_message(client, db, gemini, monkeypatch):
+    monkeypatch.setattr(gemini_module, "MAX_HISTORY_TEXT_BYTES", 1000)
+    db.docs[f"{CHAT_PATH}/messages/old"] = {
+        "uid": "owner",
+        "role": "user",
+        "content": "x" * 5000,
+        "createdAt": datetime(2025, 1, 2, tzinfo=timezone.utc),
+    }
+    sent = []
+    monkeypatch.setattr(
+        routes,
+        "generate_reply",
+        lambda messages, api_key: sent.append(gemini_module._format_messages(messages, None)) or "Sure.",
+    )
+
+    response = _send(client, "still works")
+
+    assert response.status_code == 201
+    texts = [content.parts[0].text for content in sent[0]]
+    assert "still works" in texts
+    assert "x" * 5000 not in texts
+
+
+def test_add_message_rejects_content_over_the_budget(client, db, gemini, monkeypatch):
+    monkeypatch.setattr(routes, "MAX_HISTORY_TEXT_BYTES", 10)
+
+    response = _send(client, "ü" * 6)
+
+    assert response.status_code == 413
+    assert not any(path.startswith(f"{CHAT_PATH}/messages/") for path in db.docs)
+
+
+@pytest.fixture
+def limited_client(db, tmp_path):
+    app = Flask(__name__)
+    app.request_class = Request
+    app.json = ORJSONProvider(app)
+    app.config.update(
+        GEMINI_API_KEY="test-key",
+        UPLOADS_DIR=str(tmp_path),
+        MAX_UPLOAD_SIZE=2 * 1024 * 1024,
+        MAX_CONTENT_LENGTH=1024 * 1024,
+    )
+    app.register_blueprint(routes.chats_bp)
+    return app.test_client()
+
+
+def _upload(client, data):
+    return client.post(
+        f"/{CHAT_PATH}/files",
+        data={"uid": "owner", "file": (io.BytesIO(data), "notes.txt")},
+        content_type="multipart/form-data",
+    )
+
+
+def test_upload_accepts_files_above_the_json_body_limit(limited_client, db, tmp_path):
+    response = _upload(limited_client, b"a" * (1536 * 1024))
+
+    assert response.status_code == 201
+    assert response.get_json()["file"]["size"] == 1536 * 1024
+    assert any(path.startswith(f"{CHAT_PATH}/files/") for path in db.docs)
+
+
+def test_upload_rejects_files_over_the_upload_limit(limited_client, db, tmp_path):
+    response = _upload(limited_client, b"a" * (3 * 1024 * 1024))
+
+    assert response.status_code == 413
+    assert not any(path.startswith(f"{CHAT_PATH}/files/") for path in db.docs)
+    assert not any(tmp_path.rglob("*notes.txt"))
+
+
+def test_json_routes_use_the_configured_body_limit(limited_client, db, gemini):
+    response = _send(limited_client, "x" * (2 * 1024 * 1024))
+
+    assert response.status_code == 413
+    assert gemini["replies"] == []
+
+
+def test_upload_rejects_files_just_over_the_limit(limited_client, db, tmp_path):
+    # Fits in the form overhead allowance, so only the stored size catches it.
+    response = _upload(limited_client, b"a" * (2 * 1024 * 1024 + 1))
+
+    assert response.status_code == 400
+    assert not any(tmp_path.rglob("*notes.txt"))
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [{"content": "x", "fileIds": ["missing"]}, {"content": "x", "fileIds": "f1"}, {"content": ""}],
+)
+def test_add_message_rejections_skip_the_history_read(client, db, gemini, payload):
+    response = client.post(f"/{CHAT_PATH}/messages", json={"uid": "owner", **payload})
+
+    assert response.status_code == 400
+    assert f"{CHAT_PATH}/messages" not in db.reads
+
+
+def test_firestore_executor_is_sized_from_config():
+    app = Flask(__name__)
+    app.config["FIRESTORE_READ_WORKERS"] = 3
+
+    with app.app_context():
+        executor = routes._get_firestore_executor()
+        assert routes._get_firestore_executor() is executor
+    executor.shutdown()
+
+    assert executor._max_workers == 3
+
+
+def test_list_chats_returns_the_users_chats_newest_first(client, db):
+    db.docs["chats/chat-2"] = {**db.docs[CHAT_PATH], "updatedAt": datetime(2025, 2, 1, tzinfo=timezone.utc)}
+    db.docs["chats/other"] = {**db.docs[CHAT_PATH], "uid": "intruder"}
+
+    response = client.get("/chats?uid=owner")
+
+    assert response.status_code == 200
+    assert [chat["id"] for chat in response.get_json()["items"]] == ["chat-2", "chat-1"]
+
+
+def test_delete_chat_removes_its_messages_and_files(client, db):
+    _seed_history(db)
+    db.docs["chats/chat-2/messages/keep"] = {"uid": "owner", "content": "other chat"}
+
+    response = client.delete(f"/{CHAT_PATH}", json={"uid": "owner"})
+
+    assert response.status_code == 204
+    assert not any(path.startswith(CHAT_PATH) for path in db.docs)
+    assert "chats/chat-2/messages/keep" in db.docs
+
+
+def test_delete_chat_accepts_a_query_string_uid(client, db):
+    forbidden = client.delete(f"/{CHAT_PATH}?uid=intruder")
+    assert forbidden.status_code == 403
+    assert CHAT_PATH in db.docs
+
+    response = client.delete(f"/{CHAT_PATH}?uid=owner")
+
+    assert response.status_code == 204
+    assert CHAT_PATH not in db.docs
+
+
+def _seed_file(db, tmp_path, file_id="f1", uid="owner", text="hello from the file"):
+    stored = tmp_path / "chat-1" / f"{file_id}_notes.txt"
+    stored.parent.mkdir(parents=True, exist_ok=True)
+    stored.write_text(text)
+    db.docs[f"{CHAT_PATH}/files/{file_id}"] = {
+        "uid": uid,
+        "fileName": "notes.txt",
+        "mimeType": "text/plain",
+        "size": len(text),
+        "storagePath": f"chat-1/{file_id}_notes.txt",
+        "textPreview": text,
+        "createdAt": datetime(2025, 1, 2, tzinfo=timezone.utc),
+    }
+
+
+def test_add_message_deduplicates_file_ids(client, db, gemini, tmp_path):
+    _seed_file(db, tmp_path)
+
+    response = client.post(
+        f"/{CHAT_PATH}/messages",
+        json={"uid": "owner", "content": "Summarise", "fileIds": ["f1", " f1 ", ""]},
+    )
+
+    assert response.status_code == 201
+    assert response.get_json()["userMessage"]["fileIds"] == ["f1"]
+    prompt = [m["content"] for m in gemini["replies"][-1] if m["role"] == "user"]
+    assert prompt == ["Summarise\n\n[Attached file: notes.txt (text/plain, 19 bytes)]\nhello from the file"]
+
+    rejected = client.post(f"/{CHAT_PATH}/messages", json={"uid": "owner", "fileIds": ["f1", 7]})
+    assert rejected.status_code == 400
+
+
+def test_add_message_reads_attachment_metadata_in_one_batch(client, db, gemini, tmp_path, monkeypatch):
+    _seed_file(db, tmp_path, file_id="f1")
+    _seed_file(db, tmp_path, file_id="f2")
+    batches = []
+    original_get_all = db.get_all
+    monkeypatch.setattr(db, "get_all", lambda refs: batches.append(len(refs)) or original_get_all(refs))
+
+    response = client.post(f"/{CHAT_PATH}/messages", json={"uid": "owner", "fileIds": ["f1", "f2"]})
+
+    assert response.status_code == 201
+    assert batches == [2]
+
+
+def test_add_message_reuses_cached_attachment_metadata(client, db, gemini, tmp_path):
+    _seed_file(db, tmp_path)
+    file_path = f"{CHAT_PATH}/files/f1"
+
+    assert client.post(f"/{CHAT_PATH}/messages", json={"uid": "owner", "fileIds": ["f1"]}).status_code == 201
+    assert db.reads.count(file_path) == 1
+
+    # The history now references f1 again; its metadata comes from the cache.
+    assert _send(client, "And again?").status_code == 201
+    assert db.reads.count(file_path) == 1
+
+
+def test_add_message_rejects_missing_and_foreign_files(client, db, gemini, tmp_path):
+    _seed_file(db, tmp_path, file_id="theirs", uid="intruder")
+
+    missing = client.post(f"/{CHAT_PATH}/messages", json={"uid": "owner", "fileIds": ["nope"]})
+    foreign = client.post(f"/{CHAT_PATH}/messages", json={"uid": "owner", "fileIds": ["theirs"]})
+
+    assert missing.status_code == 400
+    assert missing.get_json()["missingFileIds"] == ["nope"]
+    assert foreign.status_code == 403
+    assert foreign.get_json()["fileIds"] == ["theirs"]
+    assert gemini["replies"] == []
+
+
+def test_add_message_sends_only_the_latest_history(client, db, gemini):
+    client.application.config["CHAT_HISTORY_WINDOW"] = 2
+    for minute in range(4):
+        db.docs[f"{CHAT_PATH}/messages/m{minute}"] = {
+            "uid": "owner",
+            "role": "user",
+            "content": f"turn {minute}",
+            "createdAt": datetime(2025, 1, 2, 0, minute, tzinfo=timezone.utc),
+        }
+
+    assert _send(client, "latest").status_code == 201
+
+    sent = [m["content"] for m in gemini["replies"][-1] if m["role"] == "user"]
+    assert sent == ["turn 2", "turn 3", "latest"]
+
+
+def test_get_chat_includes_file_previews_in_message_content(client, db, tmp_path):
+    _seed_file(db, tmp_path)
+    db.docs[f"{CHAT_PATH}/messages/m1"] = {
+        "uid": "owner",
+        "role": "user",
+        "content": "See attached",
+        "fileIds": ["f1"],
+        "createdAt": datetime(2025, 1, 2, tzinfo=timezone.utc),
+    }
+
+    body = client.get(f"/{CHAT_PATH}?uid=owner").get_json()
+
+    assert body["messages"][0]["content"].startswith("See attached\n\n[Attached file: notes.txt")
+    assert body["messages"][0]["fileIds"] == ["f1"]
+    assert db.docs[f"{CHAT_PATH}/messages/m1"]["content"] == "See attached"
+
+
+def test_file_listings_use_the_download_path_template(client, db, tmp_path):
+    _seed_file(db, tmp_path)
+
+    body = client.get(f"/{CHAT_PATH}?uid=owner").get_json()
+
+    assert body["files"][0]["downloadPath"] == f"/{CHAT_PATH}/files/f1/download"
+
+
+def test_upload_stores_a_bounded_text_preview(client, db):
+    text = "é" * 3000 + "tail"
+    response = _upload(client, text.encode("utf-8"))
+
+    assert response.status_code == 201
+    assert response.get_json()["file"]["textPreview"] == text
+
+    long_response = _upload(client, ("ü" * 5000).encode("utf-8"))
+    assert long_response.get_json()["file"]["textPreview"] == "ü" * 4000
+
+
+def test_upload_bumps_the_chat_in_the_same_batch(client, db, monkeypatch):
+    commits = []
+    original_commit = FakeBatch.commit
+    monkeypatch.setattr(FakeBatch, "commit", lambda self: commits.append(len(self._ops)) or original_commit(self))
+
+    response = _upload(client, b"hello")
+
+    assert response.status_code == 201
+    assert commits == [2]
+    assert db.docs[CHAT_PATH]["updatedAt"] > datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def test_download_uses_metadata_validators_and_private_caching(client, db, tmp_path):
+    _seed_file(db, tmp_path)
+    url = f"/{CHAT_PATH}/files/f1/download?uid=owner"
+
+    response = client.get(url)
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"f1-19"'
+    assert response.cache_control.private
+    assert not response.cache_control.public
+    assert response.cache_control.max_age == routes.DOWNLOAD_MAX_AGE_SECONDS
+    response.close()
+
+    assert client.get(url, headers={"If-None-Match": '"f1-19"'}).status_code == 304
+
+
+def test_download_refuses_paths_outside_the_uploads_dir(client, db, tmp_path):
+    # A sibling directory sharing the uploads dir's name as a prefix.
+    outside = tmp_path.parent / f"{tmp_path.name}2"
+    outside.mkdir()
+    (outside / "secret.txt").write_text("secret")
+    _seed_file(db, tmp_path)
+    db.docs[f"{CHAT_PATH}/files/f1"]["storagePath"] = f"../{tmp_path.name}2/secret.txt"
+
+    response = client.get(f"/{CHAT_PATH}/files/f1/download?uid=owner")
+
+    assert response.status_code == 404
+
+
+def test_create_chat_returns_the_stored_chat(client, db):
+    response = client.post("/chats", json={"uid": "owner", "title": " Trip ", "systemPrompt": "Be brief."})
+
+    assert response.status_code == 201
+    body = response.get_json()
+    stored = db.docs[f"chats/{body['id']}"]
+    assert (body["uid"], body["title"], body["systemPrompt"]) == ("owner", "Trip", "Be brief.")
+    assert stored["title"] == "Trip"
+    assert db.reads == []
+
+
+def test_uploaded_files_download_unchanged(client, db):
+    data = b"line one\nline two" * 100_000
+    uploaded = _upload(client, data).get_json()["file"]
+
+    download = client.get(f"{uploaded['downloadPath']}?uid=owner")
+
+    assert download.status_code == 200
+    assert download.data == data
+    download.close()
@@ -1,3 +1,5 @@
+import threading
+import time
 from types import SimpleNamespace
 
 import pytest
@@ -32,11 +34,11 @@ def test_stream_reply_uses_generate_content_stream(monkeypatch):
 
     fake_client = SimpleNamespace(models=FakeModels(), files=_FakeFiles())
 
-    gemini._client_cache["stream_key"] = fake_client
+    gemini._set_client("stream_key", fake_client)
     try:
         stream = gemini.stream_reply(_simple_messages(), api_key="stream_key")
     finally:
-        gemini._client_cache.pop("stream_key", None)
+        gemini.clear_client_cache()
 
     assert isinstance(stream, _DummyStream)
 
@@ -50,10 +52,199 @@ def test_stream_reply_falls_back_to_generate_content_stream_flag(monkeypatch):
 
     fake_client = SimpleNamespace(models=FakeModels(), files=_FakeFiles())
 
-    gemini._client_cache["fallback_key"] = fake_client
+    gemini._set_client("fallback_key", fake_client)
     try:
         stream = gemini.stream_reply(_simple_messages(), api_key="fallback_key")
     finally:
-        gemini._client_cache.pop("fallback_key", None)
+        gemini.clear_client_cache()
 
     assert isinstance(stream, _DummyStream)
+
+
+def test_generate_chat_title_reuses_cached_title(monkeypatch):
+    calls = []
+
+    def fake_generate_reply(messages, **kwargs):
+        calls.append(messages)
+        return "Greeting exchange."
+
+    monkeypatch.setattr(gemini, "generate_reply", fake_generate_reply)
+    gemini.clear_title_cache()
+    try:
+        first = gemini.generate_chat_title("Hello", "Hi there", api_key="title_key")
+        second = gemini.generate_chat_title("Hello", "Hi there", api_key="title_key")
+    finally:
+        gemini.clear_title_cache()
+
+    assert first == second == "Greeting exchange"
+    assert len(calls) == 1
+
+
+def test_format_messages_uploads_attachments_once_each(tmp_path):
+    paths = []
+    for index in range(3):
+        path = tmp_path / f"file{index}.pdf"
+        path.write_bytes(b"%PDF")
+        paths.append(str(path))
+    missing = str(tmp_path / "missing.pdf")
+
+    uploaded = []
+
+    class FakeFiles:
+        def upload(self, *, path, config=None):
+            uploaded.append(path)
+            if path == missing:
+                raise FileNotFoundError(path)
+            return gemini._from_text(f"ref:{path}")
+
+    client = SimpleNamespace(files=FakeFiles())
+    parts = [{"type": "upload", "path": path, "mime_type": "application/pdf"} for path in [*paths, missing]]
+
+    contents = gemini._format_messages([{"role": "user", "parts": parts}], client)
+
+    assert sorted(uploaded) == sorted([*paths, missing])
+    assert [part.text for part in contents[0].parts] == [f"ref:{path}" for path in paths]
+
+
+def test_format_messages_drops_oldest_turns_to_fit_budget(monkeypatch):
+    monkeypatch.setattr(gemini, "MAX_HISTORY_TEXT_BYTES", 12)
+    messages = [
+        {"role": "system", "content": "be brief"},
+        {"role": "user", "content": "x" * 50},
+        {"role": "assistant", "content": "ok"},
+        {"role": "user", "content": "hi"},
+    ]
+
+    contents = gemini._format_messages(messages, SimpleNamespace(files=_FakeFiles()))
+
+    assert [content.parts[0].text for content in contents] == ["be brief", "ok", "hi"]
+
+
+def test_format_messages_counts_utf8_bytes(monkeypatch):
+    monkeypatch.setattr(gemini, "MAX_HISTORY_TEXT_BYTES", 5)
+    messages = [{"role": "user", "content": "äää"}]
+
+    with pytest.raises(gemini.GeminiRequestTooLargeError):
+        gemini._format_messages(messages, SimpleNamespace(files=_FakeFiles()))
+
+
+def test_format_messages_rejects_oversized_newest_message(monkeypatch):
+    monkeypatch.setattr(gemini, "MAX_HISTORY_TEXT_BYTES", 10)
+    messages = [{"role": "user", "content": "hello"}, {"role": "user", "content": "hello again"}]
+
+    with pytest.raises(gemini.GeminiRequestTooLargeError):
+        gemini._format_messages(messages, SimpleNamespace(files=_FakeFiles()))
+
+
+def test_generate_reply_drops_unsupported_timeout_kwargs():
+    class FakeModels:
+        def generate_content(self, *args, **kwargs):
+            if "request_options" in kwargs or "timeout" in kwargs:
+                raise TypeError("unexpected keyword argument")
+            return SimpleNamespace(text=" 6 ")
+
+    gemini._set_client("signature_key", SimpleNamespace(models=FakeModels(), files=_FakeFiles()))
+    try:
+        reply = gemini.generate_reply([{"role": "user", "content": "What is 3 + 3?"}], api_key="signature_key")
+    finally:
+        gemini.clear_client_cache()
+
+    assert reply == "6"
+
+
+def test_generate_reply_enforces_timeout_when_sdk_cannot():
+    release = threading.Event()
+
+    class SlowModels:
+        def generate_content(self, *, model, contents):
+            release.wait(5)
+            return SimpleNamespace(text="late")
+
+    gemini._set_client("slow_key", SimpleNamespace(models=SlowModels(), files=_FakeFiles()))
+    try:
+        with pytest.raises(gemini.GeminiAPIError, match="did not respond"):
+            gemini.generate_reply(_simple_messages(), api_key="slow_key", timeout=0.1)
+    finally:
+        release.set()
+        gemini.clear_client_cache()
+
+
+def test_generate_reply_coalesces_identical_concurrent_requests():
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    class SlowModels:
+        def generate_content(self, *, model, contents):
+            calls.append(contents)
+            started.set()
+            release.wait(5)
+            return SimpleNamespace(text="shared")
+
+    gemini._set_client("coalesce_key", SimpleNamespace(models=SlowModels(), files=_FakeFiles()))
+    results = []
+
+    def call():
+        results.append(gemini.generate_reply(_simple_messages(), api_key="coalesce_key", timeout=5))
+
+    first = threading.Thread(target=call)
+    second = threading.Thread(target=call)
+    try:
+        first.start()
+        assert started.wait(5)
+        second.start()
+        # Give the duplicate request time to join the in-flight call.
+        time.sleep(0.2)
+        release.set()
+        first.join(5)
+        second.join(5)
+    finally:
+        release.set()
+        gemini.clear_client_cache()
+
+    assert results == ["shared", "shared"]
+    assert len(calls) == 1
+
+
+def test_title_instruction_errors_stay_in_title_generation(monkeypatch):
+    def broken_from_text(*args, **kwargs):
+        raise TypeError("Part.from_text() takes 1 positional argument")
+
+    monkeypatch.setattr(gemini, "_from_text", broken_from_text)
+    gemini._title_system_content.cache_clear()
+    gemini.clear_title_cache()
+    try:
+        with pytest.raises(gemini.GeminiAPIError):
+            gemini.generate_chat_title("hello", "hi there", api_key="title_key")
+    finally:
+        gemini._title_system_content.cache_clear()
+
+
+def test_generate_reply_fails_fast_while_timed_out_calls_still_hang(monkeypatch):
+    release = threading.Event()
+
+    class HangingModels:
+        def generate_content(self, *, model, contents):
+            release.wait(5)
+            return SimpleNamespace(text="late")
+
+    pending_calls = threading.BoundedSemaphore(1)
+    monkeypatch.setattr(gemini, "_pending_calls", pending_calls)
+    gemini._set_client("hang_key", SimpleNamespace(models=HangingModels(), files=_FakeFiles()))
+    try:
+        with pytest.raises(gemini.GeminiAPIError, match="did not respond"):
+            gemini.generate_reply([{"role": "user", "content": "first"}], api_key="hang_key", timeout=0.1)
+        # The first call timed out but is still running, so it keeps its slot.
+        with pytest.raises(gemini.GeminiAPIError, match="still waiting"):
+            gemini.generate_reply([{"role": "user", "content": "second"}], api_key="hang_key", timeout=0.1)
+
+        release.set()
+        # Wait for the hung call to return and give its slot back.
+        assert pending_calls.acquire(timeout=5)
+        pending_calls.release()
+        reply = gemini.generate_reply([{"role": "user", "content": "third"}], api_key="hang_key", timeout=1)
+    finally:
+        release.set()
+        gemini.clear_client_cache()
+
+    assert reply == "late"
@@ -0,0 +1,39 @@
+import json
+from datetime import datetime, timezone
+
+from flask import Flask, jsonify
+
+from zen_backend.json_provider import ORJSONProvider
+
+
+def _make_app(debug: bool = False) -> Flask:
+    app = Flask(__name__)
+    app.json = ORJSONProvider(app)
+    app.debug = debug
+    return app
+
+
+def test_jsonify_output_matches_default_provider():
+    payload = {
+        "title": "Grüße",
+        "count": 3,
+        "createdAt": datetime(2025, 9, 28, 12, 30, tzinfo=timezone.utc),
+        "items": [{"b": 1, "a": None}],
+    }
+    app = _make_app()
+    reference = Flask(__name__)
+
+    with app.app_context():
+        body = jsonify(payload).get_data()
+    with reference.app_context():
+        expected = jsonify(payload).get_data()
+
+    assert json.loads(body) == json.loads(expected)
+    assert body.endswith(b"\n")
+
+
+def test_debug_responses_stay_pretty_printed():
+    app = _make_app(debug=True)
+    with app.app_context():
+        body = jsonify({"a": 1}).get_data(as_text=True)
+    assert body == '{\n  "a": 1\n}\n'
@@ -0,0 +1,163 @@
+from datetime import datetime, timezone
+import logging
+
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+from fake_firestore import FakeDocument, FakeFirestore, FakeQuery
+from zen_backend.notes import service
+from zen_backend.notes.service import NotePermissionError
+
+
+@pytest.fixture
+def db(monkeypatch):
+    fake = FakeFirestore()
+    monkeypatch.setattr(service, "get_collection", fake.collection)
+    return fake
+
+
+def _seed(db, note_id, **fields):
+    data = {
+        "uid": "owner",
+        "title": "",
+        "content": "",
+        "updatedAt": datetime(2025, 1, 1, tzinfo=timezone.utc),
+        **fields,
+    }
+    db.docs[f"notes/{note_id}"] = data
+    return data
+
+
+def _ids(notes):
+    return [note["id"] for note in notes]
+
+
+def test_create_note_returns_the_stored_payload(db):
+    note = service.create_note(
+        "owner",
+        title="  Groceries ",
+        content="Buy MILK",
+        keywords=["Food", "food"],
+        trigger_words=["Shopping"],
+    )
+
+    stored = db.docs[f"notes/{note['id']}"]
+    assert {key: value for key, value in note.items() if key != "id"} == stored
+    assert stored["title"] == "Groceries"
+    assert stored["createdAt"] == stored["updatedAt"]
+    assert db.reads == []
+
+
+def test_update_note_returns_the_stored_payload(db):
+    _seed(db, "n1", title="Old", keywords=["x"], keywordsLower=["x"])
+
+    note = service.update_note("n1", "owner", {"title": "New Title", "triggerwords": ["Alias"]})
+
+    stored = db.docs["notes/n1"]
+    assert {key: value for key, value in note.items() if key != "id"} == stored
+    assert note["id"] == "n1"
+    assert stored["triggerWords"] == ["Alias"]
+    assert stored["keywords"] == ["x"]
+    assert db.reads == ["notes/n1"]
+
+
+def test_search_filters_by_trigger_and_keyword_terms(db):
+    _seed(db, "both", triggerWordsLower=["gym"], keywordsLower=["health"])
+    _seed(db, "trigger-only", triggerWordsLower=["gym"], keywordsLower=["money"])
+    _seed(db, "neither", triggerWordsLower=["work"], keywordsLower=["health"])
+    _seed(db, "someone-else", uid="other", triggerWordsLower=["gym"], keywordsLower=["health"])
+
+    assert sorted(_ids(service.search_notes("owner", trigger_terms=["Gym"]))) == ["both", "trigger-only"]
+    assert _ids(service.search_notes("owner", trigger_terms=["gym"], keyword_terms=["health"])) == ["both"]
+    assert sorted(_ids(service.search_notes("owner", keyword_terms=["health"]))) == ["both", "neither"]
+
+
+def test_search_falls_back_to_an_unordered_scan_without_an_index(db, monkeypatch, caplog):
+    _seed(db, "n1", title="Plan", triggerWordsLower=["gym"])
+    _seed(db, "n2", title="Plan", triggerWordsLower=["work"])
+
+    class MissingIndexQuery:
+        def limit(self, count):
+            return self
+
+        def stream(self):
+            raise google_exceptions.FailedPrecondition("The query requires an index.")
+
+    monkeypatch.setattr(FakeQuery, "order_by", lambda self, field, direction="ASCENDING": MissingIndexQuery())
+    monkeypatch.setattr(service, "_missing_index_logged", False)
+
+    with caplog.at_level(logging.WARNING, logger=service.log.name):
+        # The fallback drops the server-side trigger filter, so it is applied here.
+        assert _ids(service.search_notes("owner", query="plan", trigger_terms=["gym"])) == ["n1"]
+        assert _ids(service.search_notes("owner", trigger_terms=["work"])) == ["n2"]
+
+    assert [record.levelno for record in caplog.records] == [logging.ERROR]
+    assert "firestore.indexes.json" in caplog.records[0].getMessage()
+
+
+def test_note_writes_store_capped_lowercase_copies(db):
+    note = service.create_note("owner", title="Groceries", content="A" * 5000)
+
+    stored = db.docs[f"notes/{note['id']}"]
+    assert stored["titleLower"] == "groceries"
+    assert stored["contentLower"] == "a" * service._CONTENT_LOWER_MAX_CHARS
+
+    service.update_note(note["id"], "owner", {"title": "New Title", "content": "Buy MILK"})
+
+    stored = db.docs[f"notes/{note['id']}"]
+    assert stored["titleLower"] == "new title"
+    assert stored["contentLower"] == "buy milk"
+
+
+def test_search_matches_legacy_notes_without_lowercase_fields(db):
+    _seed(db, "legacy-title", title="Quarterly PLAN")
+    _seed(db, "legacy-content", content="Remember the PLAN")
+    _seed(db, "other", title="Shopping", content="Milk")
+
+    results = service.search_notes("owner", query="Plan")
+
+    assert sorted(_ids(results)) == ["legacy-content", "legacy-title"]
+
+
+def test_search_matches_text_past_the_lowercase_copy(db):
+    content = "a" * 5000 + " NEEDLE"
+    _seed(db, "long", content=content, contentLower=content[: service._CONTENT_LOWER_MAX_CHARS].lower())
+
+    assert _ids(service.search_notes("owner", query="needle")) == ["long"]
+
+
+def test_search_matches_multi_word_queries_across_fields(db):
+    _seed(db, "spanning", title="Weekly groceries", content="Buy milk", keywords=["errands"])
+    _seed(db, "unrelated", title="Groceries", content="Sell milk")
+
+    assert _ids(service.search_notes("owner", query="groceries buy")) == ["spanning"]
+    assert _ids(service.search_notes("owner", query="milk errands")) == ["spanning"]
+    assert _ids(service.search_notes("owner", query="buy groceries")) == []
+
+
+def test_delete_note_only_reads_the_owner(db, monkeypatch):
+    _seed(db, "n1", content="private")
+    fields_read = []
+    original_get = FakeDocument.get
+
+    def recording_get(self, field_paths=None, transaction=None):
+        fields_read.append(field_paths)
+        return original_get(self, field_paths=field_paths, transaction=transaction)
+
+    monkeypatch.setattr(FakeDocument, "get", recording_get)
+
+    with pytest.raises(NotePermissionError):
+        service.delete_note("n1", "intruder")
+    assert "notes/n1" in db.docs
+
+    service.delete_note("n1", "owner")
+    assert "notes/n1" not in db.docs
+    assert fields_read == [["uid"], ["uid"]]
+
+
+def test_serialize_note_has_no_triggerwords_alias():
+    serialized = service.serialize_note("n1", {"triggerWords": ["a"], "content": None})
+
+    assert serialized["triggerWords"] == ["a"]
+    assert "triggerwords" not in serialized
+    assert serialized["content"] == serialized["excerpt"] == ""
@@ -9,6 +9,7 @@ from zen_backend.notes.utils import (  # noqa: E402
     extract_trigger_candidates,
     format_note_for_context,
     normalize_string_list,
+    normalize_string_list_pair,
 )
 
 
@@ -21,6 +22,13 @@ class NormalizeStringListTests(unittest.TestCase):
         values = ["Alpha", "alpha", "Beta", "gamma"]
         self.assertEqual(normalize_string_list(values, lowercase=True), ["alpha", "beta", "gamma"])
 
+    def test_pair_matches_both_modes_in_one_pass(self):
+        values = iter(["  Foo  ", "foo", "BAR", None, 42])
+        self.assertEqual(
+            normalize_string_list_pair(values),
+            (["Foo", "BAR", "42"], ["foo", "bar", "42"]),
+        )
+
 
 class ExtractTriggerCandidatesTests(unittest.TestCase):
     def test_extracts_unique_tokens(self):
@@ -30,6 +38,13 @@ class ExtractTriggerCandidatesTests(unittest.TestCase):
             ["project", "x", "update", "remember", "focus-mode", "go"],
         )
 
+    def test_extracts_non_latin_tokens(self):
+        text = "Treffen in München, 東京 trip, Ελληνικά notes"
+        self.assertEqual(
+            extract_trigger_candidates(text),
+            ["treffen", "in", "münchen", "東京", "trip", "ελληνικά", "notes"],
+        )
+
     def test_respects_min_length(self):
         text = "a b cd ef"
         self.assertEqual(
@@ -55,6 +70,12 @@ class FormatNoteForContextTests(unittest.TestCase):
         self.assertIn("Trigger words: project alpha", block)
         self.assertIn("2025-09-28T12:30:00+00:00", block)
 
+    def test_formats_non_string_keywords(self):
+        note = {"title": "Mixed", "keywords": ["alpha", 42], "triggerWords": ["beta"]}
+        block = format_note_for_context(note)
+        self.assertIn("Keywords: alpha, 42", block)
+        self.assertIn("Trigger words: beta", block)
+
     def test_truncates_long_content(self):
         note = {
             "title": "Long note",
@@ -0,0 +1,98 @@
+import pytest
+from firebase_admin import auth as firebase_auth
+from flask import Flask
+
+from zen_backend.json_provider import ORJSONProvider
+from zen_backend.users import routes, service
+from zen_backend.users.service import UserProfileStoreError
+
+AUTH_HEADERS = {"Authorization": "Bearer valid-token"}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    def fake_verify(id_token):
+        if id_token != "valid-token":
+            raise firebase_auth.InvalidIdTokenError("bad token")
+        return {"uid": "caller"}
+
+    monkeypatch.setattr(routes, "verify_id_token", fake_verify)
+
+    app = Flask(__name__)
+    app.json = ORJSONProvider(app)
+    app.register_blueprint(routes.users_bp)
+    return app.test_client()
+
+
+def _profile(uid):
+    return {"uid": uid, "email": f"{uid}@example.com", "displayName": uid.upper(), "photoUrl": None}
+
+
+def test_batch_requires_id_token(client, monkeypatch):
+    monkeypatch.setattr(routes, "get_user_profiles", lambda uids: pytest.fail("store was read"))
+
+    missing = client.post("/users/batch", json={"uids": ["a"]})
+    invalid = client.post("/users/batch", json={"uids": ["a"]}, headers={"Authorization": "Bearer nope"})
+
+    assert missing.status_code == 401
+    assert invalid.status_code == 401
+
+
+@pytest.mark.parametrize(
+    "uids",
+    [None, [], "a", [""], [1], ["a/b"], ["a/b/c"], ["x" * 129]],
+)
+def test_batch_rejects_invalid_uids(client, monkeypatch, uids):
+    monkeypatch.setattr(routes, "get_user_profiles", lambda uids: pytest.fail("store was read"))
+
+    response = client.post("/users/batch", json={"uids": uids}, headers=AUTH_HEADERS)
+
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "validation_error"
+
+
+def test_batch_caps_uid_count(client, monkeypatch):
+    monkeypatch.setattr(routes, "get_user_profiles", lambda uids: {})
+    at_cap = [f"user-{i}" for i in range(routes.MAX_BATCH_UIDS)]
+
+    assert client.post("/users/batch", json={"uids": at_cap}, headers=AUTH_HEADERS).status_code == 200
+    over_cap = client.post("/users/batch", json={"uids": at_cap + ["extra"]}, headers=AUTH_HEADERS)
+    assert over_cap.status_code == 400
+
+
+def test_batch_keeps_request_order_and_drops_duplicates(client, monkeypatch):
+    monkeypatch.setattr(
+        routes,
+        "get_user_profiles",
+        lambda uids: {uid: _profile(uid) for uid in ("a", "c")},
+    )
+
+    response = client.post("/users/batch", json={"uids": ["c", "b", "a", "c"]}, headers=AUTH_HEADERS)
+
+    assert response.status_code == 200
+    items = response.get_json()["items"]
+    assert [item["uid"] for item in items] == ["c", "a"]
+    assert all("email" not in item for item in items)
+
+
+def test_batch_store_error_is_503(client, monkeypatch):
+    def failing(uids):
+        raise UserProfileStoreError("unavailable")
+
+    monkeypatch.setattr(routes, "get_user_profiles", failing)
+
+    response = client.post("/users/batch", json={"uids": ["a"]}, headers=AUTH_HEADERS)
+
+    assert response.status_code == 503
+    assert response.get_json()["error"] == "profile_store_error"
+
+
+def test_get_user_profiles_reports_invalid_document_paths(monkeypatch):
+    class FakeCollection:
+        def document(self, uid):
+            raise ValueError("A document must have an even number of path elements")
+
+    monkeypatch.setattr(service, "_users_collection", lambda: FakeCollection())
+
+    with pytest.raises(UserProfileStoreError):
+        service.get_user_profiles(["a/b"])
@@ -1,10 +1,15 @@
 from __future__ import annotations
 
-from flask import Flask
+from http import HTTPStatus
+
+from flask import Flask, jsonify
 from flask_cors import CORS
+from werkzeug.exceptions import RequestEntityTooLarge
 
 from .config import AppConfig, ConfigError, load_config
 from .firebase import init_firebase
+from .json_provider import ORJSONProvider
+from .wrappers import Request
 from .auth.routes import auth_bp
 from .chats.routes import chats_bp
 from .notes.routes import notes_bp
@@ -20,6 +25,8 @@ def create_app(config: AppConfig | None = None) -> Flask:
             raise RuntimeError(f"Configuration error: {exc}") from exc
 
     app = Flask(__name__)
+    app.request_class = Request
+    app.json = ORJSONProvider(app)
 
     app.config.update(
         PORT=config.port,
@@ -29,7 +36,13 @@ def create_app(config: AppConfig | None = None) -> Flask:
         FIRESTORE_DATABASE_ID=config.firestore_database_id,
         UPLOADS_DIR=str(config.uploads_dir),
         MAX_UPLOAD_SIZE=10 * 1024 * 1024,
+        # Optional limit for every other request body; unlimited unless
+        # MAX_REQUEST_BODY_BYTES is set. The upload route applies its own
+        # limit based on MAX_UPLOAD_SIZE either way.
+        MAX_CONTENT_LENGTH=config.max_request_body_bytes,
         MAX_INLINE_ATTACHMENT_BYTES=config.max_inline_attachment_bytes,
+        CHAT_HISTORY_WINDOW=config.chat_history_window,
+        FIRESTORE_READ_WORKERS=config.firestore_read_workers,
     )
 
     CORS(app)
@@ -41,8 +54,20 @@ def create_app(config: AppConfig | None = None) -> Flask:
     app.register_blueprint(notes_bp)
     app.register_blueprint(users_bp)
 
+    @app.errorhandler(RequestEntityTooLarge)
+    def request_too_large(_exc: RequestEntityTooLarge):
+        return (
+            jsonify({"error": "payload_too_large", "message": "Request body exceeds maximum allowed size."}),
+            HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+        )
+
     @app.get("/health")
     def health_check() -> dict[str, str]:
         return {"status": "ok"}
 
+    # Build and compile the URL map now so the first request on a fresh
+    # worker does not pay for it.
+    app.url_map.update()
+    app.url_map.bind("localhost").match("/health")
+
     return app
@@ -1,14 +1,26 @@
 from __future__ import annotations
 
-from typing import Any, Dict, Iterable, Sequence
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache, partial
+from typing import Any, Callable, Iterable, Sequence
+import hashlib
+import inspect
 import logging
+import re
+import threading
 
+import orjson
 from google import genai
 from google.genai import types
 
+from ..cache import LRUCache
+
 DEFAULT_MODEL = "gemini-2.0-flash"
 
-_client_cache: Dict[str, genai.Client] = {}
+# Clients are reused per API key; the bound stops key rotation from growing
+# the cache without limit.
+_client_cache: LRUCache[str, genai.Client] = LRUCache(maxsize=8)
+_client_lock = threading.Lock()
 
 log = logging.getLogger(__name__)
 
@@ -16,104 +28,414 @@ log = logging.getLogger(__name__)
 class GeminiAPIError(RuntimeError):
     """Raised when the Gemini API responds with an error."""
 
+    __slots__ = ()
+
+
+class GeminiRequestTooLargeError(GeminiAPIError):
+    """Raised when the newest message alone exceeds the request text budget."""
+
+    __slots__ = ()
+
+
+_from_text = types.Part.from_text
+_from_bytes = types.Part.from_bytes
+
+
+def _append_text_part(part: dict[str, Any], client: genai.Client, parts: list[Any]) -> None:
+    text_value = str(part.get("text", part.get("content", ""))).strip()
+    if text_value:
+        parts.append(_from_text(text_value))
+
+
+def _append_bytes_part(part: dict[str, Any], client: genai.Client, parts: list[Any]) -> None:
+    data = part.get("data")
+    mime_type = part.get("mime_type")
+    if isinstance(data, (bytes, bytearray)) and mime_type:
+        # Avoid copying payloads that are already immutable bytes.
+        payload = data if data.__class__ is bytes else bytes(data)
+        mime_str = str(mime_type)
+        try:
+            parts.append(_from_bytes(data=payload, mime_type=mime_str))
+        except Exception as exc:
+            log.warning("Failed to attach inline bytes (%s): %s", mime_type, exc)
+
+
+def _accepts_keyword(method: Callable[..., Any], name: str) -> bool:
+    try:
+        parameters = inspect.signature(method).parameters
+    except (TypeError, ValueError):
+        return False
+    return name in parameters
+
+
+def _upload_file(client: genai.Client, path: str, mime_type: str) -> Any:
+    upload = client.files.upload
+    config = {"mime_type": mime_type}
+    # Let the SDK open the file itself when it can; it streams the upload
+    # from disk instead of going through a Python file object.
+    if _accepts_keyword(upload, "path"):
+        return upload(path=path, config=config)
+    with open(path, "rb") as fh:
+        return upload(file=fh, config=config)
+
+
+def _append_upload_part(part: dict[str, Any], client: genai.Client, parts: list[Any]) -> None:
+    file_ref = part.get("file_ref")
+    if file_ref is None:
+        path = part.get("path")
+        mime_type = part.get("mime_type")
+        if not path or not mime_type:
+            return
+        try:
+            file_ref = _upload_file(client, path, mime_type)
+            part["file_ref"] = file_ref
+        except FileNotFoundError:
+            log.warning("Attachment file not found: %s", path)
+            return
+        except Exception as exc:
+            log.warning("Failed to upload attachment %s: %s", path, exc)
+            return
+    parts.append(file_ref)
+
+
+def _append_inline_data_part(part: dict[str, Any], client: genai.Client, parts: list[Any]) -> None:
+    if "inline_data" not in part:
+        return
+    inline_data = part.get("inline_data") or {}
+    data = inline_data.get("data")
+    mime_type = inline_data.get("mime_type")
+    if isinstance(data, (bytes, bytearray)) and mime_type:
+        payload = data if data.__class__ is bytes else bytes(data)
+        mime_str = str(mime_type)
+        try:
+            parts.append(_from_bytes(data=payload, mime_type=mime_str))
+        except Exception as exc:
+            log.warning("Failed to attach inline data (%s): %s", mime_type, exc)
+
+
+_PartHandler = Callable[[dict[str, Any], genai.Client, list[Any]], None]
+
+_PART_HANDLERS: dict[str, _PartHandler] = {
+    "text": _append_text_part,
+    "bytes": _append_bytes_part,
+    "upload": _append_upload_part,
+    "inline_data": _append_inline_data_part,
+}
+
+
+def _infer_part_handler(part: dict[str, Any]) -> _PartHandler | None:
+    # Untyped parts are recognised by their payload key.
+    if "text" in part:
+        return _append_text_part
+    if "data" in part:
+        return _append_bytes_part
+    return None
+
+
+_MAX_UPLOAD_WORKERS = 8
+
+# Upper bound on the UTF-8 encoded text sent in one request. The oldest
+# conversation turns are dropped to stay within it; only a newest turn that is
+# too large on its own is rejected.
+MAX_HISTORY_TEXT_BYTES = 512 * 1024
+
+# Roles of conversation turns that may be dropped to fit the budget. System
+# instructions and pre-built contents are always kept.
+_DROPPABLE_ROLES = frozenset({"user", "assistant", "model"})
+
+_ROLE_MAP: dict[str, str] = {
+    "user": "user",
+    "assistant": "model",
+    "model": "model",
+    "system": "user",
+}
+
+_TITLE_INSTRUCTION = (
+    "Create a short, descriptive title for this conversation in six words or fewer. "
+    "Always write the title in the same language as the user's message. "
+    "Return only the title text without punctuation at the end."
+    "Give me short, factual, and clear names for AI chat conversations. The names should act as bullet points and convey the essence of the content. No unnecessary words, no marketing, just a functional description."
+)
+
+
+@lru_cache(maxsize=1)
+def _title_system_content() -> types.Content:
+    """Return the fixed title instruction, built once on first use.
+
+    Building it lazily keeps an SDK signature mismatch confined to title
+    generation instead of failing the import of the whole backend. System
+    turns are sent with the "user" role, matching _ROLE_MAP.
+    """
+
+    return types.Content(role="user", parts=[_from_text(_TITLE_INSTRUCTION)])
+
+
+# First line of a generated title without surrounding whitespace or ".;:".
+_TITLE_RE = re.compile(r"[\s.;:]*([^\r\n]*?)[\s.;:]*(?:[\r\n]|$)")
+
+
+def _upload_pending_parts(messages: Sequence[dict[str, Any] | types.Content], client: genai.Client) -> set[int]:
+    """Upload every attachment still lacking a ``file_ref`` concurrently.
+
+    Returns the ids of the parts that were attempted so the caller does not
+    retry failed uploads one by one.
+    """
+
+    pending: list[dict[str, Any]] = []
+    for message in messages:
+        if isinstance(message, types.Content):
+            continue
+        raw_parts = message.get("parts")
+        if not isinstance(raw_parts, (list, tuple)):
+            continue
+        for part in raw_parts:
+            if (
+                isinstance(part, dict)
+                and part.get("type") == "upload"
+                and part.get("file_ref") is None
+                and part.get("path")
+                and part.get("mime_type")
+            ):
+                pending.append(part)
+
+    if len(pending) < 2:
+        return set()
+
+    # Each upload stores its file_ref on the part and logs its own failures.
+    with ThreadPoolExecutor(max_workers=min(_MAX_UPLOAD_WORKERS, len(pending))) as executor:
+        list(executor.map(lambda part: _append_upload_part(part, client, []), pending))
+
+    return {id(part) for part in pending}
+
 
 def _format_messages(
-    messages: Sequence[dict[str, Any]],
+    messages: Sequence[dict[str, Any] | types.Content],
     client: genai.Client,
 ) -> list[types.Content]:
-    contents: list[types.Content] = []
-
-    role_map = {
-        "user": "user",
-        "assistant": "model",
-        "model": "model",
-        "system": "user",
-    }
+    # (content, UTF-8 text bytes, droppable) in message order.
+    entries: list[tuple[types.Content, int, bool]] = []
+    attempted_uploads = _upload_pending_parts(messages, client)
+    total_text_bytes = 0
 
     for message in messages:
-        role = role_map.get(message.get("role", "user"), "user")
+        # Pre-built contents (e.g. the fixed title instruction) pass through.
+        if isinstance(message, types.Content):
+            entries.append((message, 0, False))
+            continue
+
+        get = message.get
+        role = _ROLE_MAP.get(get("role", "user"), "user")
         parts: list[Any] = []
+        append = parts.append
 
-        raw_parts = message.get("parts")
-        if isinstance(raw_parts, Sequence):
+        raw_parts = get("parts")
+        # Strings are sequences too, so only accept real part containers.
+        if isinstance(raw_parts, (list, tuple)):
             for part in raw_parts:
                 if isinstance(part, types.Part):
-                    parts.append(part)
+                    append(part)
                     continue
 
                 if isinstance(part, str):
                     text_value = part.strip()
                     if text_value:
-                        parts.append(types.Part.from_text(text_value))
+                        append(_from_text(text_value))
                     continue
 
                 if not isinstance(part, dict):
                     continue
 
-                kind = part.get("type")
+                if id(part) in attempted_uploads and part.get("file_ref") is None:
+                    continue
 
-                if kind == "text" or "text" in part:
-                    text_value = str(part.get("text", part.get("content", ""))).strip()
-                    if text_value:
-                        parts.append(types.Part.from_text(text_value))
-                elif kind == "bytes" or "data" in part:
-                    data = part.get("data")
-                    mime_type = part.get("mime_type")
-                    if isinstance(data, (bytes, bytearray)) and mime_type:
-                        try:
-                            parts.append(types.Part.from_bytes(data=bytes(data), mime_type=str(mime_type)))
-                        except Exception as exc:
-                            log.warning("Failed to attach inline bytes (%s): %s", mime_type, exc)
-                elif kind == "upload":
-                    file_ref = part.get("file_ref")
-                    if file_ref is None:
-                        path = part.get("path")
-                        mime_type = part.get("mime_type")
-                        if not path or not mime_type:
-                            continue
-                        try:
-                            with open(path, "rb") as fh:
-                                file_ref = client.files.upload(file=fh, config={"mime_type": mime_type})
-                            part["file_ref"] = file_ref
-                        except FileNotFoundError:
-                            log.warning("Attachment file not found: %s", path)
-                            continue
-                        except Exception as exc:
-                            log.warning("Failed to upload attachment %s: %s", path, exc)
-                            continue
-                    parts.append(file_ref)
-                elif kind == "inline_data" and "inline_data" in part:
-                    inline_data = part.get("inline_data") or {}
-                    data = inline_data.get("data")
-                    mime_type = inline_data.get("mime_type")
-                    if isinstance(data, (bytes, bytearray)) and mime_type:
-                        try:
-                            parts.append(types.Part.from_bytes(data=bytes(data), mime_type=str(mime_type)))
-                        except Exception as exc:
-                            log.warning("Failed to attach inline data (%s): %s", mime_type, exc)
-
-        text = message.get("content", "")
-        if isinstance(text, str):
-            text = text.strip()
-            if text and not parts:
-                parts.append(types.Part.from_text(text))
+                handler = _PART_HANDLERS.get(part.get("type")) or _infer_part_handler(part)
+                if handler is not None:
+                    handler(part, client, parts)
+
+        # Plain content is only used when no explicit parts were given, so
+        # skip stripping it otherwise.
+        if not parts:
+            text = get("content", "")
+            if isinstance(text, str) and (text := text.strip()):
+                append(_from_text(text))
 
         if not parts:
             continue
 
-        contents.append(types.Content(role=role, parts=parts))
+        text_bytes = 0
+        for part in parts:
+            part_text = getattr(part, "text", None)
+            if part_text:
+                text_bytes += len(part_text.encode("utf-8"))
+        total_text_bytes += text_bytes
+
+        entries.append(
+            (types.Content(role=role, parts=parts), text_bytes, get("role", "user") in _DROPPABLE_ROLES)
+        )
+
+    if total_text_bytes > MAX_HISTORY_TEXT_BYTES:
+        entries = _fit_text_budget(entries, total_text_bytes)
 
-    return contents
+    return [content for content, _, _ in entries]
+
+
+def _fit_text_budget(
+    entries: list[tuple[types.Content, int, bool]], total_text_bytes: int
+) -> list[tuple[types.Content, int, bool]]:
+    """Drop the oldest conversation turns until the text fits the budget.
+
+    The newest turn is never dropped; if it does not fit even with every
+    older turn removed, ``GeminiRequestTooLargeError`` is raised.
+    """
+
+    newest = max((index for index, entry in enumerate(entries) if entry[2]), default=-1)
+    dropped: set[int] = set()
+    for index, (_, text_bytes, droppable) in enumerate(entries):
+        if total_text_bytes <= MAX_HISTORY_TEXT_BYTES:
+            break
+        if droppable and index != newest:
+            dropped.add(index)
+            total_text_bytes -= text_bytes
+
+    if total_text_bytes > MAX_HISTORY_TEXT_BYTES:
+        raise GeminiRequestTooLargeError("The message is too large to send to Gemini.")
+
+    log.info("Dropped %d older messages to fit the Gemini request budget", len(dropped))
+    return [entry for index, entry in enumerate(entries) if index not in dropped]
 
 
 def _get_client(api_key: str) -> genai.Client:
     client = _client_cache.get(api_key)
-    if client is None:
-        client = genai.Client(api_key=api_key)
-        _client_cache[api_key] = client
+    if client is not None:
+        return client
+    with _client_lock:
+        # Another thread may have built the client while we waited.
+        client = _client_cache.get(api_key)
+        if client is None:
+            client = genai.Client(api_key=api_key)
+            _client_cache.set(api_key, client)
     return client
 
 
+def _set_client(api_key: str, client: Any) -> None:
+    """Register ``client`` for ``api_key``; used by tests to inject fakes."""
+
+    _client_cache.set(api_key, client)
+
+
+def clear_client_cache() -> None:
+    """Forget every cached client, e.g. after rotating API keys or in tests."""
+
+    _client_cache.clear()
+
+
+# Ways of passing a request timeout, in order of preference. SDK releases
+# disagree on which (if any) of these keyword arguments they accept.
+_TIMEOUT_CALL_SHAPES = ("request_options", "timeout", "plain")
+
+# Call shape that worked for a given (host type, method name).
+_call_shape_cache: dict[tuple[type, str], str] = {}
+
+# Shapes under which the SDK applies the request timeout itself.
+_SDK_TIMEOUT_SHAPES = frozenset({"request_options", "timeout"})
+
+# The installed SDK sends requests without an HTTP timeout and offers no way
+# to set one, so such calls run on their own thread and the caller stops
+# waiting at its deadline. A timed-out call keeps its slot until it really
+# returns; once this many are outstanding, new calls fail fast instead of
+# queueing behind hung ones.
+MAX_PENDING_GEMINI_CALLS = 32
+_pending_calls = threading.BoundedSemaphore(MAX_PENDING_GEMINI_CALLS)
+
+
+def _call_with_deadline(call: Callable[[], Any], timeout: float) -> Any:
+    """Run ``call`` on a new daemon thread and wait at most ``timeout`` seconds.
+
+    Raises TimeoutError when the deadline passes first.
+    """
+
+    if not _pending_calls.acquire(blocking=False):
+        raise GeminiAPIError("Too many earlier Gemini API calls are still waiting for a response.")
+
+    future: Future[Any] = Future()
+
+    def run() -> None:
+        try:
+            future.set_result(call())
+        except BaseException as exc:
+            future.set_exception(exc)
+        finally:
+            _pending_calls.release()
+
+    threading.Thread(target=run, name="gemini-call", daemon=True).start()
+    return future.result(timeout=timeout)
+
+
+def _timeout_kwargs(shape: str, timeout: int) -> dict[str, Any]:
+    if shape == "request_options":
+        return {"request_options": {"timeout": timeout}}
+    if shape == "timeout":
+        return {"timeout": timeout}
+    return {}
+
+
+def _candidate_call_shapes(method: Callable[..., Any]) -> tuple[str, ...]:
+    try:
+        parameters = inspect.signature(method).parameters
+    except (TypeError, ValueError):
+        return _TIMEOUT_CALL_SHAPES
+
+    if any(param.kind is inspect.Parameter.VAR_KEYWORD for param in parameters.values()):
+        return _TIMEOUT_CALL_SHAPES
+
+    return tuple(shape for shape in _TIMEOUT_CALL_SHAPES if shape == "plain" or shape in parameters)
+
+
+def _seed_call_shapes(host_type: type, method_names: Iterable[str]) -> None:
+    """Record call shapes that the SDK signatures already settle at import."""
+
+    for method_name in method_names:
+        method = getattr(host_type, method_name, None)
+        if method is None:
+            continue
+        shapes = _candidate_call_shapes(method)
+        # The full fallback tuple means the signature was inconclusive; those
+        # methods are probed on first use instead.
+        if shapes is not _TIMEOUT_CALL_SHAPES:
+            _call_shape_cache[(host_type, method_name)] = shapes[0]
+
+
+_seed_call_shapes(genai.models.Models, ("generate_content", "generate_content_stream", "stream_generate_content"))
+
+
+def _call_with_timeout(host: Any, method_name: str, timeout: int, **kwargs: Any) -> Any:
+    """Call ``host.method_name`` passing the timeout the way the SDK accepts it.
+
+    The accepted call shape is detected from the method signature and, when
+    that is inconclusive, probed once; the result is cached per host type so
+    later calls go straight to the right shape.
+    """
+
+    method = getattr(host, method_name)
+    cache_key = (type(host), method_name)
+
+    shape = _call_shape_cache.get(cache_key)
+    if shape is not None:
+        return method(**kwargs, **_timeout_kwargs(shape, timeout))
+
+    last_exc: TypeError | None = None
+    for shape in _candidate_call_shapes(method):
+        try:
+            result = method(**kwargs, **_timeout_kwargs(shape, timeout))
+        except TypeError as exc:
+            last_exc = exc
+            continue
+        _call_shape_cache[cache_key] = shape
+        return result
+
+    raise last_exc or TypeError(f"{method_name}() rejected every supported call shape")
+
+
 def _start_stream(
     client: genai.Client,
     contents: list[types.Content],
@@ -132,44 +454,39 @@ def _start_stream(
         )
 
         for method_name in method_names:
-            method = getattr(host, method_name, None)
-            if method is None:
+            if getattr(host, method_name, None) is None:
                 continue
 
-            for kwargs in (
-                {"request_options": {"timeout": timeout}},
-                {"timeout": timeout},
-                {},
-            ):
-                try:
-                    return method(model=model, contents=contents, **kwargs)
-                except TypeError as exc:
-                    last_exc = exc
-                    continue
-                except Exception as exc:
-                    last_exc = exc
-                    raise GeminiAPIError(str(exc)) from exc
-
-        generate_method = getattr(host, "generate_content", None)
-        if callable(generate_method):
-            for kwargs in (
-                {"stream": True, "request_options": {"timeout": timeout}},
-                {"stream": True, "timeout": timeout},
-                {"stream": True},
+            try:
+                return _call_with_timeout(host, method_name, timeout, model=model, contents=contents)
+            except TypeError as exc:
+                last_exc = exc
+                continue
+            except Exception as exc:
+                last_exc = exc
+                raise GeminiAPIError(str(exc)) from exc
+
+        if callable(getattr(host, "generate_content", None)):
+            try:
+                result = _call_with_timeout(
+                    host,
+                    "generate_content",
+                    timeout,
+                    model=model,
+                    contents=contents,
+                    stream=True,
+                )
+            except TypeError as exc:
+                last_exc = exc
+                return None
+            except Exception as exc:
+                last_exc = exc
+                raise GeminiAPIError(str(exc)) from exc
+            if result is not None and (
+                hasattr(result, "__iter__") or hasattr(result, "__aiter__") or hasattr(result, "__enter__")
             ):
-                try:
-                    result = generate_method(model=model, contents=contents, **kwargs)
-                except TypeError as exc:
-                    last_exc = exc
-                    continue
-                except Exception as exc:
-                    last_exc = exc
-                    raise GeminiAPIError(str(exc)) from exc
-                if result is None:
-                    continue
-                if hasattr(result, "__iter__") or hasattr(result, "__aiter__") or hasattr(result, "__enter__"):
-                    return result
-                last_exc = TypeError("generate_content(stream=True) did not return a stream")
+                return result
+            last_exc = TypeError("generate_content(stream=True) did not return a stream")
         return None
 
     stream_ctx = _try_call(getattr(client, "models", None))
@@ -188,7 +505,7 @@ def _start_stream(
 
 
 def stream_reply(
-    messages: Sequence[dict[str, Any]],
+    messages: Sequence[dict[str, Any] | types.Content],
     api_key: str,
     model: str = DEFAULT_MODEL,
     timeout: int = 60,
@@ -204,15 +521,76 @@ def stream_reply(
     return _start_stream(client, contents, model, timeout)
 
 
+# Replies currently being generated, keyed by a digest of the request, so
+# identical concurrent requests share one upstream call.
+_inflight_replies: dict[bytes, Future[str]] = {}
+_inflight_lock = threading.Lock()
+
+
+def _fingerprint_default(value: Any) -> Any:
+    if isinstance(value, (bytes, bytearray)):
+        return hashlib.blake2b(value, digest_size=16).hexdigest()
+    if isinstance(value, types.Content):
+        return value.model_dump(mode="json", exclude_none=True)
+    return repr(value)
+
+
+def _reply_key(messages: Sequence[Any], api_key: str, model: str) -> bytes:
+    payload = orjson.dumps([api_key, model, messages], default=_fingerprint_default)
+    return hashlib.blake2b(payload, digest_size=16).digest()
+
+
 def generate_reply(
-    messages: Sequence[dict[str, Any]],
+    messages: Sequence[dict[str, Any] | types.Content],
     api_key: str,
     model: str = DEFAULT_MODEL,
     safety_settings: Iterable[dict[str, object]] | None = None,
     timeout: int = 30,
 ) -> str:
-    """Call the Gemini API with the provided conversation history."""
+    """Call the Gemini API with the provided conversation history.
+
+    Concurrent calls with the same key, model and messages wait for a single
+    upstream request and share its result (or error).
+    """
 
+    try:
+        key = _reply_key(messages, api_key, model)
+    except (TypeError, orjson.JSONEncodeError):
+        return _generate_reply(messages, api_key, model, safety_settings, timeout)
+
+    with _inflight_lock:
+        future = _inflight_replies.get(key)
+        is_owner = future is None
+        if is_owner:
+            future = Future()
+            _inflight_replies[key] = future
+
+    if not is_owner:
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError as exc:
+            raise GeminiAPIError(f"Gemini API did not respond within {timeout} seconds.") from exc
+
+    try:
+        reply = _generate_reply(messages, api_key, model, safety_settings, timeout)
+    except BaseException as exc:
+        future.set_exception(exc)
+        raise
+    else:
+        future.set_result(reply)
+        return reply
+    finally:
+        with _inflight_lock:
+            _inflight_replies.pop(key, None)
+
+
+def _generate_reply(
+    messages: Sequence[dict[str, Any] | types.Content],
+    api_key: str,
+    model: str,
+    safety_settings: Iterable[dict[str, object]] | None,
+    timeout: int,
+) -> str:
     client = _get_client(api_key)
 
     contents = _format_messages(messages, client)
@@ -227,55 +605,43 @@ def generate_reply(
             "safety_settings were provided to generate_reply but will be ignored by the SDK"
         )
 
-    # Attempt the call in a few ways to support different genai SDK versions:
-    # 1) Some versions accept `request_options={"timeout": ...}`.
-    # 2) Some accept `timeout` as a top-level kwarg.
-    # 3) Some accept neither; fall back to a call without timeout.
-    last_exc: Exception | None = None
-
+    models = client.models
+    call = partial(_call_with_timeout, models, "generate_content", timeout, model=model, contents=contents)
     try:
-        response = client.models.generate_content(
-            model=model,
-            contents=contents,
-            request_options={"timeout": timeout},
-        )
-    except TypeError as exc:
-        last_exc = exc
-        # If the SDK doesn't accept request_options, retry with timeout kwarg.
-        err_text = str(exc)
-        log.debug("generate_content TypeError (first attempt): %s", err_text)
-        try:
-            response = client.models.generate_content(
-                model=model,
-                contents=contents,
-                timeout=timeout,
-            )
-        except TypeError as exc2:
-            last_exc = exc2
-            log.debug("generate_content TypeError (second attempt): %s", str(exc2))
-            try:
-                # Final attempt: call without any timeout/request options.
-                response = client.models.generate_content(
-                    model=model,
-                    contents=contents,
-                )
-            except Exception as exc3:
-                last_exc = exc3
-                raise GeminiAPIError(str(exc3)) from exc3
-        except Exception as exc2:
-            last_exc = exc2
-            raise GeminiAPIError(str(exc2)) from exc2
+        if _call_shape_cache.get((type(models), "generate_content")) in _SDK_TIMEOUT_SHAPES:
+            response = call()
+        else:
+            # The SDK cannot enforce the timeout itself, so bound the wait here.
+            response = _call_with_deadline(call, timeout)
+    except TimeoutError as exc:
+        raise GeminiAPIError(f"Gemini API did not respond within {timeout} seconds.") from exc
+    except GeminiAPIError:
+        raise
     except Exception as exc:
-        last_exc = exc
         raise GeminiAPIError(str(exc)) from exc
 
-    reply_text = (response.text or "").strip()
+    # response.text joins the candidate parts on every access; read it once.
+    text = response.text
+    reply_text = text.strip() if text else ""
     if not reply_text:
         raise GeminiAPIError("Gemini API returned an empty response")
 
     return reply_text
 
 
+# Titles already generated for an opening exchange, keyed by
+# (api_key, model, digest of the exchange) so message text is not retained.
+_title_cache: LRUCache[tuple[str, str, bytes], str] = LRUCache(maxsize=2048)
+
+
+def _title_cache_key(user_message: str, assistant_message: str, api_key: str, model: str) -> tuple[str, str, bytes]:
+    digest = hashlib.blake2b(
+        f"{user_message}\0{assistant_message}".encode("utf-8"),
+        digest_size=16,
+    ).digest()
+    return (api_key, model, digest)
+
+
 def generate_chat_title(
     user_message: str,
     assistant_message: str,
@@ -283,23 +649,29 @@ def generate_chat_title(
     model: str = DEFAULT_MODEL,
     timeout: int = 20,
 ) -> str:
-    """Produce a concise chat title based on the opening exchange."""
+    """Produce a concise chat title based on the opening exchange.
+
+    Results are cached per opening exchange, so retries and re-titling of the
+    same conversation do not trigger another API call.
+    """
 
-    instruction = (
-        "Create a short, descriptive title for this conversation in six words or fewer. "
-        "Always write the title in the same language as the user's message. "
-        "Return only the title text without punctuation at the end."
-        "Give me short, factual, and clear names for AI chat conversations. The names should act as bullet points and convey the essence of the content. No unnecessary words, no marketing, just a functional description."
-    )
+    user_message = user_message.strip()
+    assistant_message = assistant_message.strip()
 
-    conversation = (
-        f"User: {user_message.strip()}\n"
-        f"Assistant: {assistant_message.strip()}"
-    )
+    # Keyed on the stripped text, which is all the prompt depends on.
+    cache_key = _title_cache_key(user_message, assistant_message, api_key, model)
+    cached = _title_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    try:
+        instruction = _title_system_content()
+    except (TypeError, ValueError) as exc:
+        raise GeminiAPIError(f"Failed to generate chat title: {exc}") from exc
 
     messages = [
-        {"role": "system", "content": instruction},
-        {"role": "user", "content": conversation},
+        instruction,
+        {"role": "user", "content": f"User: {user_message}\nAssistant: {assistant_message}"},
     ]
 
     try:
@@ -307,8 +679,17 @@ def generate_chat_title(
     except GeminiAPIError as exc:
         raise GeminiAPIError(f"Failed to generate chat title: {exc}") from exc
 
-    clean_title = title.splitlines()[0].strip().strip('.;:')
+    match = _TITLE_RE.match(title)
+    clean_title = match.group(1) if match else ""
     if len(clean_title) > 80:
         clean_title = clean_title[:80].rstrip()
 
-    return clean_title or "New chat"
+    clean_title = clean_title or "New chat"
+    _title_cache.set(cache_key, clean_title)
+    return clean_title
+
+
+def clear_title_cache() -> None:
+    """Forget every cached chat title."""
+
+    _title_cache.clear()
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+from typing import Any
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from cryptography.x509 import load_pem_x509_certificate
+import firebase_admin
+from firebase_admin import auth as firebase_auth
+import jwt
+import orjson
+import requests
+
+from ..cache import LRUCache
+
+log = logging.getLogger(__name__)
+
+# Stop trusting a cached verification this many seconds before the token's
+# own expiry so clock skew never lets an expired token through.
+_EXPIRY_MARGIN_SECONDS = 30
+
+# Decoded claims of recently verified ID tokens, keyed by a 16-byte BLAKE2b
+# digest of the token so raw tokens are not kept in memory.
+_verified_tokens: LRUCache[bytes, dict[str, Any]] = LRUCache(maxsize=10_000)
+
+
+def verify_id_token(id_token: str) -> dict[str, Any]:
+    """Verify a Firebase ID token, reusing earlier results until it expires.
+
+    Raises the same exceptions as ``firebase_admin.auth.verify_id_token``.
+    Every call returns its own copy of the claims, so callers may modify it.
+    """
+
+    key = hashlib.blake2b(id_token.encode("utf-8"), digest_size=16).digest()
+    cached = _verified_tokens.get(key)
+    if cached is not None:
+        return dict(cached)
+
+    # Started here rather than by the app factory so tests, CLI commands and
+    # the reloader's parent process never fetch certificates.
+    if _refresher_thread is None:
+        start_certificate_refresher()
+
+    decoded = _verify_locally(id_token) or firebase_auth.verify_id_token(id_token)
+
+    expires_at = decoded.get("exp")
+    if isinstance(expires_at, (int, float)):
+        ttl = expires_at - time.time() - _EXPIRY_MARGIN_SECONDS
+        if ttl > 0:
+            _verified_tokens.set(key, dict(decoded), ttl=ttl)
+
+    return decoded
+
+
+# Public keys of the current ID token signing certificates, by key id. Filled
+# by refresh_signing_certificates().
+_signing_keys: dict[str, Any] = {}
+
+_MAX_SUBJECT_LENGTH = 128
+
+# Public endpoints documented for verifying Firebase ID tokens with a
+# third-party JWT library.
+ID_TOKEN_CERT_URI = (
+    "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+)
+ID_TOKEN_ISSUER_PREFIX = "https://securetoken.google.com/"
+
+
+def _verify_locally(id_token: str) -> dict[str, Any] | None:
+    """Verify ``id_token`` against the cached signing keys.
+
+    Performs the same checks as the Admin SDK for an unrevoked ID token.
+    Returns None whenever the token cannot be accepted here (unknown key,
+    any validation failure, emulator mode) so the caller falls back to the
+    Admin SDK, which raises its usual, more specific errors.
+    """
+
+    if not _signing_keys or os.getenv("FIREBASE_AUTH_EMULATOR_HOST"):
+        return None
+
+    try:
+        header = jwt.get_unverified_header(id_token)
+        key = _signing_keys.get(header.get("kid"))
+        if key is None or header.get("alg") != "RS256":
+            return None
+
+        project_id = firebase_admin.get_app().project_id
+        if not project_id:
+            return None
+
+        claims = jwt.decode(
+            id_token,
+            key=key,
+            algorithms=["RS256"],
+            audience=project_id,
+            issuer=ID_TOKEN_ISSUER_PREFIX + project_id,
+            options={"require": ["exp", "iat", "sub"]},
+        )
+    except (jwt.PyJWTError, ValueError):
+        return None
+
+    subject = claims.get("sub")
+    if not isinstance(subject, str) or not subject or len(subject) > _MAX_SUBJECT_LENGTH:
+        return None
+
+    claims["uid"] = subject
+    return claims
+
+
+# How often the background thread refreshes the signing keys.
+CERTIFICATE_REFRESH_INTERVAL_SECONDS = 30 * 60
+
+_refresher_lock = threading.Lock()
+_refresher_thread: threading.Thread | None = None
+
+_http_session = requests.Session()
+_http_session.headers.update({"User-Agent": "zen-backend/1.0"})
+
+
+def refresh_signing_certificates() -> None:
+    """Fetch the ID token signing certificates and cache their public keys.
+
+    The parsed keys back the local verification fast path, so requests only
+    fall through to the Admin SDK (and its own certificate fetch) for tokens
+    signed with a key this process has not seen yet.
+    """
+
+    global _signing_keys
+
+    response = _http_session.get(ID_TOKEN_CERT_URI, timeout=10)
+    if response.status_code != 200:
+        raise RuntimeError(f"certificate fetch returned HTTP {response.status_code}")
+
+    certificates = orjson.loads(response.content)
+    keys = {
+        kid: load_pem_x509_certificate(pem.encode("utf-8")).public_key()
+        for kid, pem in certificates.items()
+    }
+    _signing_keys = keys
+
+
+def _refresh_certificates_forever(interval: float) -> None:
+    first_attempt = True
+    while True:
+        try:
+            refresh_signing_certificates()
+        except Exception as exc:  # pragma: no cover - best-effort background work
+            if first_attempt:
+                log.error("Unable to fetch Firebase signing certificates: %s", exc)
+            else:
+                log.warning("Unable to refresh Firebase signing certificates: %s", exc)
+        first_attempt = False
+        time.sleep(interval)
+
+
+def start_certificate_refresher(interval: float = CERTIFICATE_REFRESH_INTERVAL_SECONDS) -> None:
+    """Start the daemon thread that keeps signing certificates cached (once per process)."""
+
+    global _refresher_thread
+
+    with _refresher_lock:
+        if _refresher_thread is not None:
+            return
+        _refresher_thread = threading.Thread(
+            target=_refresh_certificates_forever,
+            args=(interval,),
+            name="firebase-cert-refresh",
+            daemon=True,
+        )
+        _refresher_thread.start()
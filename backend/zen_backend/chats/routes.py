@@ -1,13 +1,15 @@
 from __future__ import annotations
 
+from concurrent.futures import Future, ThreadPoolExecutor
 from contextlib import nullcontext
 from datetime import datetime, timezone
+from functools import lru_cache
 from http import HTTPStatus
-from pathlib import Path
+from pathlib import Path, PurePath
 from typing import Any, Iterable
 from uuid import uuid4
 
-from flask import Blueprint, Response, current_app, jsonify, request, send_file, url_for
+from flask import Blueprint, Response, current_app, jsonify, request, send_file
 from flask import stream_with_context
 from firebase_admin import firestore as firebase_firestore
 from google.api_core import exceptions as google_exceptions
@@ -15,27 +17,78 @@ from werkzeug.utils import secure_filename
 import logging
 import re
 import mimetypes
-
-import json
-
-from ..ai.gemini import GeminiAPIError, generate_reply, generate_chat_title, stream_reply
-from ..firebase import get_firestore_client
+import threading
+
+import orjson
+
+from ..ai.gemini import (
+    MAX_HISTORY_TEXT_BYTES,
+    GeminiAPIError,
+    GeminiRequestTooLargeError,
+    generate_reply,
+    generate_chat_title,
+    stream_reply,
+)
+from ..cache import LRUCache
+from ..firebase import get_collection, get_firestore_client
 from ..notes.service import find_notes_for_text, format_note_for_context
 
 chats_bp = Blueprint("chats", __name__, url_prefix="/chats")
 log = logging.getLogger(__name__)
 
+_UTC = timezone.utc
+
 DEFAULT_INLINE_ATTACHMENT_MAX_BYTES = 350_000
 
+# Number of most recent stored messages sent to Gemini with a new message.
+DEFAULT_CHAT_HISTORY_WINDOW = 40
+
+# Documents read per keys-only page when deleting a chat's subcollections.
+DELETE_PAGE_SIZE = 500
+
+# Attempts per document before a bulk delete gives up on it. BulkWriter's own
+# default (15, with linear backoff) could hold a request for minutes.
+BULK_DELETE_MAX_ATTEMPTS = 3
+
+# Uploads are copied to disk in chunks of this size.
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# Room for the multipart boundaries and form fields around the uploaded file
+# when the upload route sizes its request body limit.
+UPLOAD_FORM_OVERHEAD_BYTES = 64 * 1024
+
+_UPLOAD_ROOT_EXTENSION = "zen_upload_root"
+
+# How long clients may reuse a downloaded file without revalidating it.
+DOWNLOAD_MAX_AGE_SECONDS = 3600
+
+# Streamed replies start title generation once this much text has arrived
+# (roughly 100 tokens), so the title request overlaps the rest of the stream.
+SPECULATIVE_TITLE_MIN_CHARS = 400
+
+_title_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="chat-title")
+
+# Worker threads for the concurrent Firestore reads of requests, shared by
+# all requests of an app; FIRESTORE_READ_WORKERS overrides it.
+DEFAULT_FIRESTORE_READ_WORKERS = 32
+
+_FIRESTORE_EXECUTOR_EXTENSION = "zen_firestore_executor"
+_firestore_executor_lock = threading.Lock()
+
+# File documents never change after upload, so their metadata is cached by
+# (chat id, file id) for the attachment lookups of later messages.
+FILE_METADATA_CACHE_TTL_SECONDS = 300
+_file_metadata_cache: LRUCache[tuple[str, str], dict[str, Any]] = LRUCache(
+    maxsize=4096, ttl=FILE_METADATA_CACHE_TTL_SECONDS
+)
+
 
 def _sse_message(payload: dict[str, Any], event: str | None = None) -> str:
-    body = json.dumps(payload, ensure_ascii=False)
-    lines: list[str] = []
+    # Compact JSON never contains a raw CR or LF, so it fits on one data line.
+    body = orjson.dumps(payload).decode("utf-8")
     if event:
-        lines.append(f"event: {event}")
-    for line in body.splitlines() or [""]:
-        lines.append(f"data: {line}")
-    return "\n".join(lines) + "\n\n"
+        return f"event: {event}\ndata: {body}\n\n"
+    return f"data: {body}\n\n"
 
 
 def _extract_text_from_event(event: Any) -> str:
@@ -78,73 +131,143 @@ def _parse_json_body() -> dict[str, Any]:
 
 
 def _now() -> datetime:
-    return datetime.now(timezone.utc)
+    return datetime.now(_UTC)
 
 
 def _to_iso(value: Any) -> str | None:
     if isinstance(value, datetime):
+        # Firestore timestamps and _now() are already UTC.
+        if value.tzinfo is _UTC:
+            return value.isoformat()
         if value.tzinfo is None:
-            value = value.replace(tzinfo=timezone.utc)
-        return value.astimezone(timezone.utc).isoformat()
+            value = value.replace(tzinfo=_UTC)
+        return value.astimezone(_UTC).isoformat()
     return None
 
 
 def _serialize_chat(doc_id: str, data: dict[str, Any]) -> dict[str, Any]:
+    get = data.get
     return {
         "id": doc_id,
-        "uid": data.get("uid"),
-        "title": data.get("title"),
-        "systemPrompt": data.get("systemPrompt"),
-        "createdAt": _to_iso(data.get("createdAt")),
-        "updatedAt": _to_iso(data.get("updatedAt")),
+        "uid": get("uid"),
+        "title": get("title"),
+        "systemPrompt": get("systemPrompt"),
+        "createdAt": _to_iso(get("createdAt")),
+        "updatedAt": _to_iso(get("updatedAt")),
     }
 
 
-def _serialize_message(doc_id: str, data: dict[str, Any]) -> dict[str, Any]:
+# Message fields read back from Firestore; everything a prompt or a response
+# needs. Queries project to these so other stored fields are not sent.
+_MESSAGE_FIELDS = ("role", "content", "fileIds", "createdAt")
+# Prompt history does not need timestamps; Firestore orders by createdAt
+# without returning it.
+_HISTORY_FIELDS = ("role", "content", "fileIds")
+
+
+def _serialize_message(
+    doc_id: str, data: dict[str, Any], *, content_override: str | None = None
+) -> dict[str, Any]:
+    get = data.get
+    return {
+        "id": doc_id,
+        "role": get("role"),
+        "content": get("content") if content_override is None else content_override,
+        "createdAt": _to_iso(get("createdAt")),
+        "fileIds": get("fileIds", []),
+    }
+
+
+def _serialize_new_message(doc_id: str, data: dict[str, Any]) -> dict[str, Any]:
+    """Serialize a message built by add_message.
+
+    Those dicts always carry role, content and a UTC ``createdAt`` from
+    _now(), so the defensive lookups of _serialize_message are skipped.
+    """
+
     return {
         "id": doc_id,
-        "role": data.get("role"),
-        "content": data.get("content"),
-        "createdAt": _to_iso(data.get("createdAt")),
+        "role": data["role"],
+        "content": data["content"],
+        "createdAt": data["createdAt"].isoformat(),
         "fileIds": data.get("fileIds", []),
     }
 
 
+# Path of the download_file route. Chat and file ids are URL-safe (Firestore
+# auto ids and uuid4 hex), so the path is formatted directly instead of
+# going through url_for() for every file in a listing.
+_DOWNLOAD_PATH_TEMPLATE = f"{chats_bp.url_prefix}/{{chat_id}}/files/{{file_id}}/download"
+
+
 def _serialize_file(chat_id: str, doc_id: str, data: dict[str, Any]) -> dict[str, Any]:
+    get = data.get
     return {
         "id": doc_id,
-        "fileName": data.get("fileName"),
-        "mimeType": data.get("mimeType"),
-        "size": data.get("size"),
-        "createdAt": _to_iso(data.get("createdAt")),
-        "downloadPath": url_for("chats.download_file", chat_id=chat_id, file_id=doc_id, _external=False),
-        "textPreview": data.get("textPreview"),
+        "fileName": get("fileName"),
+        "mimeType": get("mimeType"),
+        "size": get("size"),
+        "createdAt": _to_iso(get("createdAt")),
+        "downloadPath": request.script_root
+        + _DOWNLOAD_PATH_TEMPLATE.format(chat_id=chat_id, file_id=doc_id),
+        "textPreview": get("textPreview"),
     }
 
 
 def _get_upload_root() -> Path:
+    # UPLOADS_DIR is fixed for the app's lifetime, so resolve and create it
+    # once per app rather than on every file request.
+    root = current_app.extensions.get(_UPLOAD_ROOT_EXTENSION)
+    if root is not None:
+        return root
+
     upload_dir = current_app.config.get("UPLOADS_DIR")
     if not upload_dir:
         raise RuntimeError("UPLOADS_DIR is not configured for the application.")
     root = Path(upload_dir).resolve()
     root.mkdir(parents=True, exist_ok=True)
+    current_app.extensions[_UPLOAD_ROOT_EXTENSION] = root
     return root
 
 
+def _get_firestore_executor() -> ThreadPoolExecutor:
+    # Sized from the app's config, so it is created per app on first use.
+    executor = current_app.extensions.get(_FIRESTORE_EXECUTOR_EXTENSION)
+    if executor is not None:
+        return executor
+
+    with _firestore_executor_lock:
+        executor = current_app.extensions.get(_FIRESTORE_EXECUTOR_EXTENSION)
+        if executor is None:
+            workers = int(current_app.config.get("FIRESTORE_READ_WORKERS", DEFAULT_FIRESTORE_READ_WORKERS))
+            executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="firestore")
+            current_app.extensions[_FIRESTORE_EXECUTOR_EXTENSION] = executor
+    return executor
+
+
 def _resolve_storage_path(relative_path: str) -> Path:
     root = _get_upload_root()
     candidate = (root / relative_path).resolve()
-    if not str(candidate).startswith(str(root)):
+    # Path-aware containment check; a string prefix test would also accept
+    # sibling directories such as "<root>2".
+    if not candidate.is_relative_to(root):
         raise RuntimeError("Resolved file path is outside the uploads directory.")
     return candidate
 
 
-def _extract_text_snippet(file_path: Path, mime_type: str | None, limit: int = 4000) -> str | None:
-    mime = mime_type or mimetypes.guess_type(file_path.name)[0]
-    if mime is None:
-        return None
+@lru_cache(maxsize=1024)
+def _guess_mime_for_suffixes(suffixes: str) -> str | None:
+    return mimetypes.guess_type("file" + suffixes)[0]
+
+
+def _guess_mime(name: str) -> str | None:
+    """Guess a MIME type from a file name; only its extensions affect the result."""
 
-    textual_mimes = {
+    return _guess_mime_for_suffixes("".join(PurePath(name).suffixes))
+
+
+_TEXTUAL_MIMES = frozenset(
+    {
         "text/plain",
         "text/markdown",
         "text/csv",
@@ -155,43 +278,71 @@ def _extract_text_snippet(file_path: Path, mime_type: str | None, limit: int = 4
         "application/yaml",
         "application/x-yaml",
     }
+)
+
 
-    if not (mime.startswith("text/") or mime in textual_mimes):
+def _extract_text_snippet(file_path: Path, mime_type: str | None, limit: int = 4000) -> str | None:
+    mime = mime_type or _guess_mime(file_path.name)
+    if mime is None:
         return None
 
+    if not (mime.startswith("text/") or mime in _TEXTUAL_MIMES):
+        return None
+
+    # UTF-8 needs at most four bytes per character, so this many bytes always
+    # decode to at least ``limit`` characters.
     try:
-        with file_path.open("r", encoding="utf-8", errors="ignore") as fp:
-            snippet = fp.read(limit + 1)
+        with file_path.open("rb") as fp:
+            raw = fp.read(limit * 4 + 4)
     except OSError:
         return None
 
-    if len(snippet) > limit:
-        snippet = snippet[:limit]
-
+    snippet = raw.decode("utf-8", errors="ignore")[:limit]
     return snippet.strip() or None
 
 
 def _get_files_metadata(chat_ref, file_ids: Iterable[str]) -> dict[str, dict[str, Any]]:
+    unique_ids = [file_id for file_id in dict.fromkeys(file_ids) if file_id]
+    if not unique_ids:
+        return {}
+
+    chat_id = chat_ref.id
     files_data: dict[str, dict[str, Any]] = {}
+    misses: list[str] = []
+    for file_id in unique_ids:
+        cached = _file_metadata_cache.get((chat_id, file_id))
+        if cached is None:
+            misses.append(file_id)
+        else:
+            # Callers may modify what they get back; keep the cached copy intact.
+            files_data[file_id] = dict(cached)
+    if not misses:
+        return files_data
+
     files_collection = chat_ref.collection("files")
-    for file_id in file_ids:
-        if not file_id or file_id in files_data:
-            continue
-        try:
-            snapshot = files_collection.document(file_id).get()
-        except google_exceptions.PermissionDenied as exc:
-            raise FirestoreAccessError(exc)
-        except google_exceptions.GoogleAPICallError as exc:
-            raise FirestoreAccessError(exc)
-        if snapshot.exists:
-            files_data[file_id] = snapshot.to_dict() or {}
+    refs = [files_collection.document(file_id) for file_id in misses]
+    # One batched read instead of a round-trip per file.
+    try:
+        for snapshot in get_firestore_client().get_all(refs):
+            if snapshot.exists:
+                data = snapshot.to_dict() or {}
+                _file_metadata_cache.set((chat_id, snapshot.id), data)
+                files_data[snapshot.id] = dict(data)
+    except google_exceptions.PermissionDenied as exc:
+        raise FirestoreAccessError(exc)
+    except google_exceptions.GoogleAPICallError as exc:
+        raise FirestoreAccessError(exc)
     return files_data
 
 
 def _compose_message_content(base_content: str, file_ids: Iterable[str], files_data: dict[str, dict[str, Any]]) -> str:
     content = base_content or ""
+    # Most messages have no attachments.
+    if not file_ids:
+        return content
+
     attachment_blocks: list[str] = []
-    for file_id in file_ids or []:
+    for file_id in file_ids:
         file_info = files_data.get(file_id)
         if not file_info:
             continue
@@ -251,7 +402,7 @@ def _build_attachment_descriptors(file_ids: Iterable[str], files_data: dict[str,
         if not absolute_path.exists():
             continue
 
-        mime_type = file_info.get("mimeType") or mimetypes.guess_type(absolute_path.name)[0]
+        mime_type = file_info.get("mimeType") or _guess_mime(absolute_path.name)
         if not mime_type:
             continue
 
@@ -296,19 +447,21 @@ def _prepare_message_parts(content: str, file_ids: Iterable[str], files_data: di
 
 
 def _get_chat_ref(chat_id: str):
-    db = get_firestore_client()
-    return db.collection("chats").document(chat_id)
+    return get_collection("chats").document(chat_id)
+
+
+_DOES_NOT_EXIST_RE = re.compile("does not exist", re.IGNORECASE)
+_PROJECT_RE = re.compile(r"project\s+([\w-]+)")
 
 
 def _firestore_error_response(exc: Exception) -> tuple[Any, int]:
     # Provide helpful client-facing messages for common Firestore issues.
     exc_text = str(exc) or ""
-    lower = exc_text.lower()
 
     # If the project does not have a Firestore/Datastore database created yet
-    if isinstance(exc, google_exceptions.NotFound) or "does not exist" in lower:
+    if isinstance(exc, google_exceptions.NotFound) or _DOES_NOT_EXIST_RE.search(exc_text):
         # try to extract a project id from the error text
-        m = re.search(r"project\s+([\w-]+)", exc_text)
+        m = _PROJECT_RE.search(exc_text)
         project = m.group(1) if m else None
         setup_url = (
             f"https://console.cloud.google.com/datastore/setup?project={project}"
@@ -330,7 +483,7 @@ def _firestore_error_response(exc: Exception) -> tuple[Any, int]:
             "and ensure credentials have the required permissions."
         )
     return (
-        jsonify({"error": "firestore_service_unavailable", "message": message, "detail": str(exc)}),
+        jsonify({"error": "firestore_service_unavailable", "message": message, "detail": exc_text}),
         HTTPStatus.SERVICE_UNAVAILABLE,
     )
 
@@ -340,10 +493,48 @@ class FirestoreAccessError(Exception):
 
 
 
-def _get_chat_for_user(chat_id: str, uid: str):
+def _stream_documents(query) -> list[Any]:
+    return list(query.stream())
+
+
+def _iter_document_refs(collection_ref, page_size: int = DELETE_PAGE_SIZE):
+    """Yield a reference to every document in ``collection_ref``.
+
+    Reads keys-only pages of ``page_size`` documents so large collections are
+    never held in memory at once.
+    """
+
+    query = collection_ref.select([]).limit(page_size)
+    page = query.get()
+    while page:
+        for snapshot in page:
+            yield snapshot.reference
+        if len(page) < page_size:
+            return
+        page = query.start_after(page[-1]).get()
+
+
+def _set_and_touch_chat(chat_ref, doc_ref, data: dict[str, Any], updated_at: datetime) -> None:
+    """Store ``data`` at ``doc_ref`` and bump the chat's ``updatedAt`` in one commit."""
+
+    batch = get_firestore_client().batch()
+    batch.set(doc_ref, data)
+    batch.update(chat_ref, {"updatedAt": updated_at})
+    batch.commit()
+
+
+# Chat fields read by endpoints that only need to check ownership.
+_CHAT_OWNER_FIELDS = ("uid",)
+# Chat fields add_message needs to build the prompt and decide on a title.
+_CHAT_PROMPT_FIELDS = ("uid", "title", "systemPrompt")
+
+
+def _get_chat_for_user(chat_id: str, uid: str, field_paths: Iterable[str] | None = None):
+    """Return ``(chat_ref, data)``; ``field_paths``, if given, must include ``uid``."""
+
     chat_ref = _get_chat_ref(chat_id)
     try:
-        chat_snapshot = chat_ref.get()
+        chat_snapshot = chat_ref.get(field_paths=field_paths)
     except google_exceptions.PermissionDenied as exc:
         raise FirestoreAccessError(exc)
     except google_exceptions.GoogleAPICallError as exc:
@@ -381,9 +572,7 @@ def create_chat() -> tuple[Any, int]:
         "updatedAt": now,
     }
 
-    db = get_firestore_client()
-    chats_collection = db.collection("chats")
-    chat_ref = chats_collection.document()
+    chat_ref = get_collection("chats").document()
     try:
         chat_ref.set(chat_data)
     except google_exceptions.PermissionDenied as exc:
@@ -403,25 +592,24 @@ def list_chats() -> tuple[Any, int]:
             HTTPStatus.BAD_REQUEST,
         )
 
-    db = get_firestore_client()
     query = (
-        db.collection("chats")
+        get_collection("chats")
         .where("uid", "==", uid)
         .order_by("updatedAt", direction=firebase_firestore.Query.DESCENDING)
     )
 
+    # Serialize documents as the query streams them in rather than collecting
+    # the snapshots first; errors can surface mid-stream, so this stays in the try.
     try:
-        chat_docs = list(query.stream())
+        chats = [
+            _serialize_chat(doc.id, doc.to_dict() or {})
+            for doc in query.stream()
+        ]
     except google_exceptions.PermissionDenied as exc:
         return _firestore_error_response(exc)
     except google_exceptions.GoogleAPICallError as exc:
         return _firestore_error_response(exc)
 
-    chats = [
-        _serialize_chat(doc.id, doc.to_dict() or {})
-        for doc in chat_docs
-    ]
-
     return jsonify({"items": chats}), HTTPStatus.OK
 
 
@@ -449,49 +637,45 @@ def get_chat(chat_id: str) -> tuple[Any, int]:
             HTTPStatus.FORBIDDEN,
         )
 
-    messages_ref = chat_ref.collection("messages").order_by("createdAt")
+    # Messages and files are only read once ownership is confirmed, so a
+    # rejected request never streams another user's history; the two
+    # subcollection queries then run concurrently.
+    executor = _get_firestore_executor()
+    messages_future = executor.submit(
+        _stream_documents,
+        chat_ref.collection("messages").select(_MESSAGE_FIELDS).order_by("createdAt"),
+    )
+    files_future = executor.submit(
+        _stream_documents, chat_ref.collection("files").order_by("createdAt")
+    )
+
     try:
-        message_docs = list(messages_ref.stream())
+        message_docs = messages_future.result()
+        file_docs = files_future.result()
     except google_exceptions.PermissionDenied as exc:
         return _firestore_error_response(exc)
     except google_exceptions.GoogleAPICallError as exc:
         return _firestore_error_response(exc)
 
-    file_ids: set[str] = set()
     raw_messages: list[dict[str, Any]] = []
     for doc in message_docs:
-        data = doc.to_dict() or {}
-        raw_messages.append({"id": doc.id, "data": data})
-        for fid in data.get("fileIds", []) or []:
-            if isinstance(fid, str) and fid:
-                file_ids.add(fid)
+        raw_messages.append({"id": doc.id, "data": doc.to_dict() or {}})
 
-    files_data: dict[str, dict[str, Any]] = {}
-    if file_ids:
-        try:
-            files_data = _get_files_metadata(chat_ref, file_ids)
-        except FirestoreAccessError as exc:
-            return _firestore_error_response(exc)
+    # Every file of the chat was just read, so attachment metadata comes from
+    # that listing instead of a second lookup.
+    files_data: dict[str, dict[str, Any]] = {doc.id: doc.to_dict() or {} for doc in file_docs}
+    for file_id, file_info in files_data.items():
+        _file_metadata_cache.set((chat_ref.id, file_id), dict(file_info))
 
     messages = []
     for item in raw_messages:
         data = item["data"]
         enriched_content = _compose_message_content(data.get("content", ""), data.get("fileIds", []), files_data)
-        enriched = dict(data)
-        enriched["content"] = enriched_content
-        messages.append(_serialize_message(item["id"], enriched))
-
-    files_ref = chat_ref.collection("files").order_by("createdAt")
-    try:
-        file_docs = list(files_ref.stream())
-    except google_exceptions.PermissionDenied as exc:
-        return _firestore_error_response(exc)
-    except google_exceptions.GoogleAPICallError as exc:
-        return _firestore_error_response(exc)
+        messages.append(_serialize_message(item["id"], data, content_override=enriched_content))
 
     files = [
-        _serialize_file(chat_ref.id, doc.id, doc.to_dict() or {})
-        for doc in file_docs
+        _serialize_file(chat_ref.id, file_id, file_info)
+        for file_id, file_info in files_data.items()
     ]
 
     return (
@@ -560,8 +744,9 @@ def update_chat(chat_id: str) -> tuple[Any, int]:
 
 @chats_bp.delete("/<chat_id>")
 def delete_chat(chat_id: str) -> tuple[Any, int]:
-    payload = _parse_json_body()
-    uid: str | None = payload.get("uid")
+    # Some proxies drop DELETE bodies, so a query-string uid is accepted too;
+    # the body is only parsed when the query string has none.
+    uid: str | None = request.args.get("uid") or _parse_json_body().get("uid")
     if not uid:
         return (
             jsonify({"error": "validation_error", "message": "uid is required."}),
@@ -569,7 +754,7 @@ def delete_chat(chat_id: str) -> tuple[Any, int]:
         )
 
     try:
-        chat_ref, chat_data = _get_chat_for_user(chat_id, uid)
+        chat_ref, chat_data = _get_chat_for_user(chat_id, uid, _CHAT_OWNER_FIELDS)
     except FirestoreAccessError as exc:
         return _firestore_error_response(exc)
     if chat_ref is None:
@@ -583,13 +768,39 @@ def delete_chat(chat_id: str) -> tuple[Any, int]:
             HTTPStatus.FORBIDDEN,
         )
 
-    batch = get_firestore_client().batch()
-    messages_ref = chat_ref.collection("messages")
+    failures: list[Any] = []
+
+    def on_write_error(failure, _writer) -> bool:
+        if failure.attempts < BULK_DELETE_MAX_ATTEMPTS:
+            return True
+        failures.append(failure)
+        return False
+
+    # BulkWriter sends the deletes in parallel, non-atomic batches; the chat
+    # itself is only deleted once all of its subcollection documents are gone.
+    bulk_writer = get_firestore_client().bulk_writer()
+    bulk_writer.on_write_error(on_write_error)
     try:
-        for message_doc in messages_ref.stream():
-            batch.delete(message_doc.reference)
-        batch.delete(chat_ref)
-        batch.commit()
+        try:
+            for collection_name in ("messages", "files"):
+                for doc_ref in _iter_document_refs(chat_ref.collection(collection_name)):
+                    bulk_writer.delete(doc_ref)
+        finally:
+            bulk_writer.close()
+
+        if failures:
+            return (
+                jsonify(
+                    {
+                        "error": "firestore_service_unavailable",
+                        "message": "Unable to delete every message and file of the chat.",
+                        "detail": failures[0].message,
+                    }
+                ),
+                HTTPStatus.SERVICE_UNAVAILABLE,
+            )
+
+        chat_ref.delete()
     except google_exceptions.PermissionDenied as exc:
         return _firestore_error_response(exc)
     except google_exceptions.GoogleAPICallError as exc:
@@ -600,6 +811,11 @@ def delete_chat(chat_id: str) -> tuple[Any, int]:
 
 @chats_bp.post("/<chat_id>/files")
 def upload_file(chat_id: str) -> tuple[Any, int]:
+    # Must happen before anything touches request.form so Werkzeug applies the
+    # upload limit, rather than the small app-wide one, while parsing the body.
+    max_size = int(current_app.config.get("MAX_UPLOAD_SIZE", 10 * 1024 * 1024))
+    request.max_content_length = max_size + UPLOAD_FORM_OVERHEAD_BYTES
+
     if request.content_type and "multipart/form-data" not in request.content_type:
         return (
             jsonify({"error": "validation_error", "message": "Request must be multipart/form-data."}),
@@ -614,7 +830,7 @@ def upload_file(chat_id: str) -> tuple[Any, int]:
         )
 
     try:
-        chat_ref, chat_data = _get_chat_for_user(chat_id, uid)
+        chat_ref, chat_data = _get_chat_for_user(chat_id, uid, _CHAT_OWNER_FIELDS)
     except FirestoreAccessError as exc:
         return _firestore_error_response(exc)
     if chat_ref is None:
@@ -635,14 +851,6 @@ def upload_file(chat_id: str) -> tuple[Any, int]:
             HTTPStatus.BAD_REQUEST,
         )
 
-    max_size = int(current_app.config.get("MAX_UPLOAD_SIZE", 10 * 1024 * 1024))
-    content_length = request.content_length
-    if content_length and content_length > max_size:
-        return (
-            jsonify({"error": "validation_error", "message": "File exceeds maximum allowed size."}),
-            HTTPStatus.BAD_REQUEST,
-        )
-
     filename = secure_filename(file.filename)
     if not filename:
         filename = "upload"
@@ -655,21 +863,18 @@ def upload_file(chat_id: str) -> tuple[Any, int]:
     stored_filename = f"{file_id}_{filename}"
     destination = chat_dir / stored_filename
 
+    # Werkzeug has already enforced the request body limit while parsing the
+    # form, so this only copies the spooled upload into place.
     try:
-        file.save(destination)
+        file.save(destination, buffer_size=UPLOAD_CHUNK_SIZE)
+        size = destination.stat().st_size
     except Exception as exc:
-        if destination.exists():
-            destination.unlink(missing_ok=True)
+        destination.unlink(missing_ok=True)
         return (
             jsonify({"error": "upload_failed", "message": "Unable to store file.", "detail": str(exc)}),
             HTTPStatus.INTERNAL_SERVER_ERROR,
         )
 
-    try:
-        size = destination.stat().st_size
-    except OSError:
-        size = 0
-
     if size == 0:
         destination.unlink(missing_ok=True)
         return (
@@ -684,7 +889,7 @@ def upload_file(chat_id: str) -> tuple[Any, int]:
             HTTPStatus.BAD_REQUEST,
         )
 
-    mime_type = file.mimetype or mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    mime_type = file.mimetype or _guess_mime(filename) or "application/octet-stream"
 
     storage_path = str(destination.relative_to(upload_root))
     text_preview = _extract_text_snippet(destination, mime_type)
@@ -702,14 +907,14 @@ def upload_file(chat_id: str) -> tuple[Any, int]:
 
     file_ref = chat_ref.collection("files").document(file_id)
     try:
-        file_ref.set(file_data)
-        chat_ref.update({"updatedAt": now})
+        _set_and_touch_chat(chat_ref, file_ref, file_data, now)
     except google_exceptions.PermissionDenied as exc:
         destination.unlink(missing_ok=True)
         return _firestore_error_response(exc)
     except google_exceptions.GoogleAPICallError as exc:
         destination.unlink(missing_ok=True)
         return _firestore_error_response(exc)
+    _file_metadata_cache.set((chat_ref.id, file_ref.id), dict(file_data))
 
     serialized = _serialize_file(chat_ref.id, file_ref.id, file_data)
     return jsonify({"file": serialized}), HTTPStatus.CREATED
@@ -725,7 +930,7 @@ def list_files(chat_id: str) -> tuple[Any, int]:
         )
 
     try:
-        chat_ref, chat_data = _get_chat_for_user(chat_id, uid)
+        chat_ref, chat_data = _get_chat_for_user(chat_id, uid, _CHAT_OWNER_FIELDS)
     except FirestoreAccessError as exc:
         return _firestore_error_response(exc)
     if chat_ref is None:
@@ -741,17 +946,15 @@ def list_files(chat_id: str) -> tuple[Any, int]:
 
     files_ref = chat_ref.collection("files").order_by("createdAt")
     try:
-        file_docs = list(files_ref.stream())
+        files = [
+            _serialize_file(chat_ref.id, doc.id, doc.to_dict() or {})
+            for doc in files_ref.stream()
+        ]
     except google_exceptions.PermissionDenied as exc:
         return _firestore_error_response(exc)
     except google_exceptions.GoogleAPICallError as exc:
         return _firestore_error_response(exc)
 
-    files = [
-        _serialize_file(chat_ref.id, doc.id, doc.to_dict() or {})
-        for doc in file_docs
-    ]
-
     return jsonify({"items": files}), HTTPStatus.OK
 
 
@@ -765,7 +968,7 @@ def download_file(chat_id: str, file_id: str):
         )
 
     try:
-        chat_ref, chat_data = _get_chat_for_user(chat_id, uid)
+        chat_ref, chat_data = _get_chat_for_user(chat_id, uid, _CHAT_OWNER_FIELDS)
     except FirestoreAccessError as exc:
         return _firestore_error_response(exc)
     if chat_ref is None:
@@ -816,13 +1019,23 @@ def download_file(chat_id: str, file_id: str):
         )
 
     download_name = data.get("fileName") or absolute_path.name
-    return send_file(
+    # Stored files never change (file ids are unique per upload), so the
+    # validators come from the metadata instead of being derived from the file.
+    created_at = data.get("createdAt")
+    response = send_file(
         absolute_path,
-        mimetype=data.get("mimeType") or mimetypes.guess_type(download_name)[0],
+        mimetype=data.get("mimeType") or _guess_mime(download_name),
         as_attachment=True,
         download_name=download_name,
         conditional=True,
+        etag=f"{file_id}-{data.get('size')}",
+        last_modified=created_at if isinstance(created_at, datetime) else None,
+        max_age=DOWNLOAD_MAX_AGE_SECONDS,
     )
+    # send_file marks responses with a max_age public; downloads are per user.
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
 
 
 @chats_bp.post("/<chat_id>/messages")
@@ -835,18 +1048,13 @@ def add_message(chat_id: str) -> tuple[Any, int]:
     raw_file_ids = payload.get("fileIds") or []
 
     if isinstance(raw_file_ids, list):
-        file_ids = []
-        for fid in raw_file_ids:
-            if not isinstance(fid, str):
-                return (
-                    jsonify({"error": "validation_error", "message": "fileIds must be a list of strings."}),
-                    HTTPStatus.BAD_REQUEST,
-                )
-            fid_clean = fid.strip()
-            if not fid_clean:
-                continue
-            if fid_clean not in file_ids:
-                file_ids.append(fid_clean)
+        if not all(isinstance(fid, str) for fid in raw_file_ids):
+            return (
+                jsonify({"error": "validation_error", "message": "fileIds must be a list of strings."}),
+                HTTPStatus.BAD_REQUEST,
+            )
+        # dict.fromkeys drops repeats while keeping the first occurrence's order.
+        file_ids = list(dict.fromkeys(filter(None, map(str.strip, raw_file_ids))))
     elif raw_file_ids:
         return (
             jsonify({"error": "validation_error", "message": "fileIds must be a list."}),
@@ -875,9 +1083,18 @@ def add_message(chat_id: str) -> tuple[Any, int]:
             jsonify({"error": "validation_error", "message": "role must be 'user' or 'system'."}),
             HTTPStatus.BAD_REQUEST,
         )
+    # Older turns are dropped to fit Gemini's text budget, but a message that
+    # cannot fit on its own is refused before it is stored.
+    if len(content.encode("utf-8")) > MAX_HISTORY_TEXT_BYTES:
+        return (
+            jsonify({"error": "payload_too_large", "message": "Message content is too large."}),
+            HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+        )
 
+    # Read on every message rather than cached: another worker may have
+    # renamed, re-prompted or deleted the chat since the last one.
     try:
-        chat_ref, chat_data = _get_chat_for_user(chat_id, uid)
+        chat_ref, chat_data = _get_chat_for_user(chat_id, uid, _CHAT_PROMPT_FIELDS)
     except FirestoreAccessError as exc:
         return _firestore_error_response(exc)
     if chat_ref is None:
@@ -898,8 +1115,10 @@ def add_message(chat_id: str) -> tuple[Any, int]:
         except FirestoreAccessError as exc:
             return _firestore_error_response(exc)
 
-        missing = [fid for fid in file_ids if fid not in attachments_data]
-        if missing:
+        # file_ids has no duplicates, so every file was found exactly when the
+        # counts match; only build the list of missing ids otherwise.
+        if len(attachments_data) != len(file_ids):
+            missing = [fid for fid in file_ids if fid not in attachments_data]
             return (
                 jsonify(
                     {
@@ -911,8 +1130,8 @@ def add_message(chat_id: str) -> tuple[Any, int]:
                 HTTPStatus.BAD_REQUEST,
             )
 
-        unauthorised = [fid for fid, meta in attachments_data.items() if meta.get("uid") != uid]
-        if unauthorised:
+        if any(meta.get("uid") != uid for meta in attachments_data.values()):
+            unauthorised = [fid for fid, meta in attachments_data.items() if meta.get("uid") != uid]
             return (
                 jsonify(
                     {
@@ -924,8 +1143,18 @@ def add_message(chat_id: str) -> tuple[Any, int]:
                 HTTPStatus.FORBIDDEN,
             )
 
-    db = get_firestore_client()
+    # The history read is independent of storing the new message, so it runs
+    # alongside it, but only once the request has passed validation. Only the
+    # latest messages are sent, so per-turn work does not grow with the chat;
+    # the new message is appended locally below rather than read back.
     messages_ref = chat_ref.collection("messages")
+    history_window = int(current_app.config.get("CHAT_HISTORY_WINDOW", DEFAULT_CHAT_HISTORY_WINDOW))
+    history_query = (
+        messages_ref.select(_HISTORY_FIELDS).order_by("createdAt").limit_to_last(history_window)
+    )
+    # limit_to_last queries only support get(), not stream().
+    history_future = _get_firestore_executor().submit(history_query.get)
+
     now = _now()
 
     user_message_data = {
@@ -939,9 +1168,8 @@ def add_message(chat_id: str) -> tuple[Any, int]:
 
     try:
         user_message_ref = messages_ref.document()
-        user_message_ref.set(user_message_data)
-
-        chat_ref.update({"updatedAt": now})
+        _set_and_touch_chat(chat_ref, user_message_ref, user_message_data, now)
+        history_docs = history_future.result()
     except google_exceptions.PermissionDenied as exc:
         return _firestore_error_response(exc)
     except google_exceptions.GoogleAPICallError as exc:
@@ -954,7 +1182,7 @@ def add_message(chat_id: str) -> tuple[Any, int]:
                 {
                     "error": "not_configured",
                     "message": "GEMINI_API_KEY is not configured.",
-                    "userMessage": _serialize_message(user_message_ref.id, user_message_data),
+                    "userMessage": _serialize_new_message(user_message_ref.id, user_message_data),
                 }
             ),
             HTTPStatus.SERVICE_UNAVAILABLE,
@@ -963,14 +1191,6 @@ def add_message(chat_id: str) -> tuple[Any, int]:
     accept_header = (request.headers.get("Accept") or "").lower()
     wants_stream = bool(payload.get("stream")) or "text/event-stream" in accept_header
 
-    history_query = messages_ref.order_by("createdAt")
-    try:
-        history_docs = list(history_query.stream())
-    except google_exceptions.PermissionDenied as exc:
-        return _firestore_error_response(exc)
-    except google_exceptions.GoogleAPICallError as exc:
-        return _firestore_error_response(exc)
-
     history_messages = []
     if chat_data.get("systemPrompt"):
         history_messages.append({"role": "system", "content": chat_data["systemPrompt"]})
@@ -979,8 +1199,12 @@ def add_message(chat_id: str) -> tuple[Any, int]:
 
     history_records: list[tuple[str, dict[str, Any]]] = []
     for doc in history_docs:
+        # The read may or may not have seen the message stored alongside it.
+        if doc.id == user_message_ref.id:
+            continue
         data = doc.to_dict() or {}
         history_records.append((doc.id, data))
+    history_records.append((user_message_ref.id, user_message_data))
 
     additional_file_ids: set[str] = set()
     for _, data in history_records:
@@ -1043,21 +1267,31 @@ def add_message(chat_id: str) -> tuple[Any, int]:
     history_messages.append({"role": "system", "content": language_instruction})
 
     if wants_stream:
-        serialized_user = _serialize_message(user_message_ref.id, user_message_data)
+        serialized_user = _serialize_new_message(user_message_ref.id, user_message_data)
 
         def event_stream():
             yield _sse_message({"type": "user_message", "message": serialized_user})
 
             try:
                 stream_ctx = stream_reply(history_messages, api_key=gemini_api_key)
+            except GeminiRequestTooLargeError as exc:
+                yield _sse_message({"type": "error", "message": str(exc), "error": "payload_too_large"})
+                return
             except GeminiAPIError as exc:
                 yield _sse_message({"type": "error", "message": str(exc), "error": "ai_error"})
                 return
 
             aggregated_chunks: list[str] = []
+            aggregated_length = 0
             final_response: Any | None = None
             manager = stream_ctx if hasattr(stream_ctx, "__enter__") else nullcontext(stream_ctx)
 
+            chat_title = (chat_data.get("title") or "").strip()
+            default_titles = {"", "new chat"}
+            should_update_title = chat_title.lower() in default_titles or chat_title == content
+            user_prompt_for_title = user_message_data.get("content", "") or latest_user_text
+            title_future: Future[str] | None = None
+
             try:
                 with manager as stream:
                     for event in stream:
@@ -1065,13 +1299,24 @@ def add_message(chat_id: str) -> tuple[Any, int]:
                         if not text_chunk:
                             continue
                         aggregated_chunks.append(text_chunk)
-                        yield _sse_message(
-                            {
-                                "type": "token",
-                                "token": text_chunk,
-                                "text": "".join(aggregated_chunks),
-                            }
-                        )
+                        aggregated_length += len(text_chunk)
+                        if (
+                            should_update_title
+                            and title_future is None
+                            and aggregated_length >= SPECULATIVE_TITLE_MIN_CHARS
+                        ):
+                            # Name the chat from the start of the reply while
+                            # the rest of it is still streaming.
+                            title_future = _title_executor.submit(
+                                generate_chat_title,
+                                user_message=user_prompt_for_title,
+                                assistant_message="".join(aggregated_chunks),
+                                api_key=gemini_api_key,
+                            )
+                        # Only the new chunk is sent; clients append tokens
+                        # themselves, so resending the whole reply would make
+                        # the stream quadratic in the reply length.
+                        yield _sse_message({"type": "token", "token": text_chunk})
 
                     get_final = getattr(stream, "get_final_response", None)
                     if callable(get_final):
@@ -1116,10 +1361,19 @@ def add_message(chat_id: str) -> tuple[Any, int]:
                 "createdAt": created_at,
             }
 
+            # Short replies never started a speculative title; start it now so
+            # it runs while the assistant message is being stored.
+            if should_update_title and title_future is None:
+                title_future = _title_executor.submit(
+                    generate_chat_title,
+                    user_message=user_prompt_for_title,
+                    assistant_message=final_text,
+                    api_key=gemini_api_key,
+                )
+
             try:
                 ai_message_ref = messages_ref.document()
-                ai_message_ref.set(ai_message_data)
-                chat_ref.update({"updatedAt": created_at})
+                _set_and_touch_chat(chat_ref, ai_message_ref, ai_message_data, created_at)
             except google_exceptions.PermissionDenied as exc:
                 yield _sse_message(
                     {
@@ -1141,22 +1395,14 @@ def add_message(chat_id: str) -> tuple[Any, int]:
                 )
                 return
 
-            serialized_assistant = _serialize_message(ai_message_ref.id, ai_message_data)
+            serialized_assistant = _serialize_new_message(ai_message_ref.id, ai_message_data)
             yield _sse_message({"type": "assistant_message", "message": serialized_assistant})
 
-            chat_title = (chat_data.get("title") or "").strip()
-            default_titles = {"", "new chat"}
-            should_update_title = chat_title.lower() in default_titles or chat_title == content
             updated_title: str | None = None
 
-            if should_update_title:
-                user_prompt_for_title = user_message_data.get("content", "") or latest_user_text
+            if title_future is not None:
                 try:
-                    updated_title = generate_chat_title(
-                        user_message=user_prompt_for_title,
-                        assistant_message=final_text,
-                        api_key=gemini_api_key,
-                    )
+                    updated_title = title_future.result()
                 except GeminiAPIError as exc:
                     log.warning("Unable to generate chat title: %s", exc)
 
@@ -1182,13 +1428,24 @@ def add_message(chat_id: str) -> tuple[Any, int]:
 
     try:
         ai_reply = generate_reply(history_messages, api_key=gemini_api_key)
+    except GeminiRequestTooLargeError as exc:
+        return (
+            jsonify(
+                {
+                    "error": "payload_too_large",
+                    "message": str(exc),
+                    "userMessage": _serialize_new_message(user_message_ref.id, user_message_data),
+                }
+            ),
+            HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+        )
     except GeminiAPIError as exc:
         return (
             jsonify(
                 {
                     "error": "ai_error",
                     "message": str(exc),
-                    "userMessage": _serialize_message(user_message_ref.id, user_message_data),
+                    "userMessage": _serialize_new_message(user_message_ref.id, user_message_data),
                 }
             ),
             HTTPStatus.BAD_GATEWAY,
@@ -1201,28 +1458,33 @@ def add_message(chat_id: str) -> tuple[Any, int]:
         "createdAt": _now(),
     }
 
-    try:
-        ai_message_ref = messages_ref.document()
-        ai_message_ref.set(ai_message_data)
-        chat_ref.update({"updatedAt": ai_message_data["createdAt"]})
-    except google_exceptions.PermissionDenied as exc:
-        return _firestore_error_response(exc)
-    except google_exceptions.GoogleAPICallError as exc:
-        return _firestore_error_response(exc)
-
     chat_title = (chat_data.get("title") or "").strip()
     default_titles = {"", "new chat"}
     should_update_title = chat_title.lower() in default_titles or chat_title == content
     updated_title: str | None = None
 
+    # Generate the title while the assistant message is being stored.
+    title_future: Future[str] | None = None
     if should_update_title:
         user_prompt_for_title = user_message_data.get("content", "") or latest_user_text
+        title_future = _title_executor.submit(
+            generate_chat_title,
+            user_message=user_prompt_for_title,
+            assistant_message=ai_reply,
+            api_key=gemini_api_key,
+        )
+
+    try:
+        ai_message_ref = messages_ref.document()
+        _set_and_touch_chat(chat_ref, ai_message_ref, ai_message_data, ai_message_data["createdAt"])
+    except google_exceptions.PermissionDenied as exc:
+        return _firestore_error_response(exc)
+    except google_exceptions.GoogleAPICallError as exc:
+        return _firestore_error_response(exc)
+
+    if title_future is not None:
         try:
-            updated_title = generate_chat_title(
-                user_message=user_prompt_for_title,
-                assistant_message=ai_reply,
-                api_key=gemini_api_key,
-            )
+            updated_title = title_future.result()
         except GeminiAPIError as exc:
             log.warning("Unable to generate chat title: %s", exc)
 
@@ -1241,8 +1503,8 @@ def add_message(chat_id: str) -> tuple[Any, int]:
     return (
         jsonify(
             {
-                "userMessage": _serialize_message(user_message_ref.id, user_message_data),
-                "assistantMessage": _serialize_message(ai_message_ref.id, ai_message_data),
+                "userMessage": _serialize_new_message(user_message_ref.id, user_message_data),
+                "assistantMessage": _serialize_new_message(ai_message_ref.id, ai_message_data),
             }
         ),
         HTTPStatus.CREATED,
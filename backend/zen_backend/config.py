@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import functools
 import os
 from dataclasses import dataclass
 from pathlib import Path
@@ -12,7 +13,7 @@ class ConfigError(Exception):
     """Raised when required configuration is missing or invalid."""
 
 
-@dataclass(slots=True)
+@dataclass(slots=True, frozen=True)
 class AppConfig:
     port: int
     firebase_credentials_path: Path
@@ -21,24 +22,32 @@ class AppConfig:
     uploads_dir: Path
     max_inline_attachment_bytes: int
     firestore_database_id: Optional[str] = None
+    chat_history_window: int = 40
+    firestore_read_workers: int = 32
+    max_request_body_bytes: Optional[int] = None
 
 
 def _resolve_path(path_str: str, base_dir: Path) -> Path:
-    candidate = Path(path_str.strip()).expanduser()
-    if candidate.is_absolute():
-        return candidate
+    candidate = os.path.expanduser(path_str.strip())
+    if os.path.isabs(candidate):
+        return Path(candidate)
 
     for root in (base_dir, base_dir.parent):
-        resolved = (root / candidate).resolve()
-        if resolved.exists():
-            return resolved
+        resolved = os.path.realpath(os.path.join(root, candidate))
+        if os.path.exists(resolved):
+            return Path(resolved)
 
     # Fallback: return path relative to base dir even if it doesn't exist yet.
-    return (base_dir / candidate).resolve()
+    return Path(os.path.realpath(os.path.join(base_dir, candidate)))
 
 
+@functools.lru_cache(maxsize=1)
 def load_config() -> AppConfig:
-    """Load configuration from environment variables/.env file."""
+    """Load configuration from environment variables/.env file.
+
+    The result is computed once per process; later calls return the same
+    frozen ``AppConfig``.
+    """
     backend_dir = Path(__file__).resolve().parent.parent
     dotenv_path = backend_dir / ".env"
     load_dotenv(dotenv_path)
@@ -80,6 +89,32 @@ def load_config() -> AppConfig:
             "MAX_INLINE_ATTACHMENT_BYTES must be an integer representing bytes"
         ) from exc
 
+    chat_history_window_raw = os.getenv("CHAT_HISTORY_WINDOW", "40")
+    try:
+        chat_history_window = max(1, int(chat_history_window_raw))
+    except ValueError as exc:
+        raise ConfigError(
+            "CHAT_HISTORY_WINDOW must be an integer number of messages"
+        ) from exc
+
+    firestore_read_workers_raw = os.getenv("FIRESTORE_READ_WORKERS", "32")
+    try:
+        firestore_read_workers = max(1, int(firestore_read_workers_raw))
+    except ValueError as exc:
+        raise ConfigError(
+            "FIRESTORE_READ_WORKERS must be an integer number of threads"
+        ) from exc
+
+    max_request_body_raw = os.getenv("MAX_REQUEST_BODY_BYTES")
+    max_request_body_bytes: Optional[int] = None
+    if max_request_body_raw:
+        try:
+            max_request_body_bytes = max(1, int(max_request_body_raw))
+        except ValueError as exc:
+            raise ConfigError(
+                "MAX_REQUEST_BODY_BYTES must be an integer representing bytes"
+            ) from exc
+
     return AppConfig(
         port=port,
         firebase_credentials_path=credentials_path,
@@ -88,4 +123,7 @@ def load_config() -> AppConfig:
         uploads_dir=uploads_dir,
         max_inline_attachment_bytes=max_inline_attachment_bytes,
         firestore_database_id=firestore_database_id,
+        chat_history_window=chat_history_window,
+        firestore_read_workers=firestore_read_workers,
+        max_request_body_bytes=max_request_body_bytes,
     )
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Optional
+from typing import Any, Optional
 import json
 import os
 import logging
@@ -16,6 +16,8 @@ firebase_app: Optional[firebase_admin.App] = None
 _firestore_client: Optional[firestore.Client] = None
 _firestore_database_id: Optional[str] = None
 _firestore_project_id: Optional[str] = None
+# Top-level collection references by name, with the client they belong to.
+_collections: dict[str, tuple[firestore.Client, Any]] = {}
 
 
 def init_firebase(credentials_path: Path, database_id: Optional[str] = None) -> firebase_admin.App:
@@ -96,3 +98,18 @@ def get_firestore_client() -> firestore.Client:
             _firestore_client = firestore.client(app=firebase_app)
 
     return _firestore_client
+
+
+def get_collection(name: str) -> Any:
+    """Return a shared reference to the top-level collection ``name``.
+
+    References are cached per client, so a new client (e.g. after the database
+    selection changes) gets fresh references.
+    """
+
+    client = get_firestore_client()
+    entry = _collections.get(name)
+    if entry is None or entry[0] is not client:
+        entry = (client, client.collection(name))
+        _collections[name] = entry
+    return entry[1]
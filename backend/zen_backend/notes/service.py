@@ -7,8 +7,13 @@ import logging
 from firebase_admin import firestore as firebase_firestore
 from google.api_core import exceptions as google_exceptions
 
-from ..firebase import get_firestore_client
-from .utils import extract_trigger_candidates, format_note_for_context, normalize_string_list
+from ..firebase import get_collection
+from .utils import (
+    extract_trigger_candidates,
+    format_note_for_context,
+    normalize_string_list,
+    normalize_string_list_pair,
+)
 
 log = logging.getLogger(__name__)
 
@@ -40,12 +45,28 @@ class NotePermissionError(NoteStoreError):
     """Raised when a caller attempts to act on a note they do not own."""
 
 
+_UTC = timezone.utc
+
 _NOTES_COLLECTION = "notes"
 _MAX_SEARCH_SCAN = 500
+# Firestore caps the number of values in an array-contains-any filter.
+_MAX_ARRAY_CONTAINS_ANY = 30
+# Notes store lowercase copies of title and content for search; the content
+# copy is capped at this many characters and longer notes are lowered at
+# search time.
+_CONTENT_LOWER_MAX_CHARS = 4096
+# Shared stand-in for missing list fields; serialized notes only read them.
+_EMPTY: tuple[()] = ()
+# Set once the missing-index fallback in search_notes has been logged.
+_missing_index_logged = False
 
 
 def _notes_collection():
-    return get_firestore_client().collection(_NOTES_COLLECTION)
+    return get_collection(_NOTES_COLLECTION)
+
+
+def _now() -> datetime:
+    return datetime.now(_UTC)
 
 
 def _to_datetime(value: Any) -> datetime | None:
@@ -55,7 +76,7 @@ def _to_datetime(value: Any) -> datetime | None:
         return value
     to_datetime = getattr(value, "to_datetime", None)
     if callable(to_datetime):
-        return to_datetime(tz=timezone.utc)
+        return to_datetime(tz=_UTC)
     return None
 
 
@@ -63,9 +84,12 @@ def _to_iso(value: Any) -> str | None:
     dt = _to_datetime(value)
     if dt is None:
         return None
+    # Firestore timestamps and _now() are already UTC.
+    if dt.tzinfo is _UTC:
+        return dt.isoformat()
     if dt.tzinfo is None:
-        dt = dt.replace(tzinfo=timezone.utc)
-    return dt.astimezone(timezone.utc).isoformat()
+        dt = dt.replace(tzinfo=_UTC)
+    return dt.astimezone(_UTC).isoformat()
 
 
 def serialize_note(document_id: str, data: dict[str, Any]) -> dict[str, Any]:
@@ -73,17 +97,14 @@ def serialize_note(document_id: str, data: dict[str, Any]) -> dict[str, Any]:
     if content is None:
         content = ""
 
-    trigger_words = data.get("triggerWords") or []
-
     serialized = {
         "id": document_id,
         "uid": data.get("uid"),
         "title": data.get("title"),
         "content": content,
         "excerpt": content,
-        "keywords": data.get("keywords") or [],
-        "triggerWords": trigger_words,
-        "triggerwords": trigger_words,
+        "keywords": data.get("keywords") or _EMPTY,
+        "triggerWords": data.get("triggerWords") or _EMPTY,
         "createdAt": _to_iso(data.get("createdAt")),
         "updatedAt": _to_iso(data.get("updatedAt")),
     }
@@ -96,15 +117,11 @@ def _ensure_ownership(data: dict[str, Any], uid: str, note_id: str) -> None:
 
 
 def _prepare_keywords(values: Iterable[Any] | None) -> tuple[list[str], list[str]]:
-    original = normalize_string_list(values)
-    lowered = normalize_string_list(values, lowercase=True)
-    return original, lowered
+    return normalize_string_list_pair(values)
 
 
 def _prepare_trigger_words(values: Iterable[Any] | None) -> tuple[list[str], list[str]]:
-    original = normalize_string_list(values)
-    lowered = normalize_string_list(values, lowercase=True)
-    return original, lowered
+    return normalize_string_list_pair(values)
 
 
 def _clean_title(value: str | None) -> str:
@@ -134,16 +151,21 @@ def create_note(
     keywords_clean, keywords_lower = _prepare_keywords(keywords)
     trigger_clean, trigger_lower = _prepare_trigger_words(trigger_words)
 
+    # Timestamps are set here rather than with SERVER_TIMESTAMP so the stored
+    # note can be returned without reading it back.
+    now = _now()
     data = {
         "uid": uid,
         "title": title_clean,
+        "titleLower": title_clean.lower(),
         "content": content_clean,
+        "contentLower": content_clean[:_CONTENT_LOWER_MAX_CHARS].lower(),
         "keywords": keywords_clean,
         "keywordsLower": keywords_lower,
         "triggerWords": trigger_clean,
         "triggerWordsLower": trigger_lower,
-        "createdAt": firebase_firestore.SERVER_TIMESTAMP,
-        "updatedAt": firebase_firestore.SERVER_TIMESTAMP,
+        "createdAt": now,
+        "updatedAt": now,
     }
 
     notes_col = _notes_collection()
@@ -151,13 +173,11 @@ def create_note(
 
     try:
         doc_ref.set(data)
-        snapshot = doc_ref.get()
     except (google_exceptions.PermissionDenied, google_exceptions.GoogleAPICallError) as exc:
         raise NoteStoreError(str(exc)) from exc
 
-    stored = snapshot.to_dict() or {}
-    stored["id"] = doc_ref.id
-    return stored
+    data["id"] = doc_ref.id
+    return data
 
 
 def list_notes(uid: str, *, limit: int | None = None) -> list[dict[str, Any]]:
@@ -172,17 +192,17 @@ def list_notes(uid: str, *, limit: int | None = None) -> list[dict[str, Any]]:
     if limit:
         query = query.limit(limit)
 
+    # Build results as documents stream in rather than collecting snapshots
+    # first; errors can surface mid-stream, so this stays in the try.
+    results: list[dict[str, Any]] = []
     try:
-        documents = list(query.stream())
+        for doc in query.stream():
+            payload = doc.to_dict() or {}
+            payload["id"] = doc.id
+            results.append(payload)
     except (google_exceptions.PermissionDenied, google_exceptions.GoogleAPICallError) as exc:
         raise NoteStoreError(str(exc)) from exc
 
-    results: list[dict[str, Any]] = []
-    for doc in documents:
-        payload = doc.to_dict() or {}
-        payload["id"] = doc.id
-        results.append(payload)
-
     return results
 
 
@@ -222,10 +242,14 @@ def update_note(note_id: str, uid: str, updates: dict[str, Any]) -> dict[str, An
     update_payload: dict[str, Any] = {}
 
     if "title" in updates:
-        update_payload["title"] = _clean_title(updates.get("title"))
+        title_clean = _clean_title(updates.get("title"))
+        update_payload["title"] = title_clean
+        update_payload["titleLower"] = title_clean.lower()
     if "content" in updates or "excerpt" in updates:
         content_source = updates.get("content", updates.get("excerpt"))
-        update_payload["content"] = _clean_content(content_source)
+        content_clean = _clean_content(content_source)
+        update_payload["content"] = content_clean
+        update_payload["contentLower"] = content_clean[:_CONTENT_LOWER_MAX_CHARS].lower()
     if "keywords" in updates:
         keywords_clean, keywords_lower = _prepare_keywords(updates.get("keywords"))
         update_payload["keywords"] = keywords_clean
@@ -239,25 +263,25 @@ def update_note(note_id: str, uid: str, updates: dict[str, Any]) -> dict[str, An
     if not update_payload:
         raise NoteStoreError("No supported fields provided for update")
 
-    update_payload["updatedAt"] = firebase_firestore.SERVER_TIMESTAMP
+    update_payload["updatedAt"] = _now()
 
     try:
         doc_ref.update(update_payload)
-        final_snapshot = doc_ref.get()
     except (google_exceptions.PermissionDenied, google_exceptions.GoogleAPICallError) as exc:
         raise NoteStoreError(str(exc)) from exc
 
-    final_data = final_snapshot.to_dict() or {}
-    final_data["id"] = note_id
-    return final_data
+    stored.update(update_payload)
+    stored["id"] = note_id
+    return stored
 
 
 def delete_note(note_id: str, uid: str) -> None:
     notes_col = _notes_collection()
     doc_ref = notes_col.document(note_id)
 
+    # Only the owner is needed to authorise the delete; skip the note body.
     try:
-        snapshot = doc_ref.get()
+        snapshot = doc_ref.get(field_paths=["uid"])
     except (google_exceptions.PermissionDenied, google_exceptions.GoogleAPICallError) as exc:
         raise NoteStoreError(str(exc)) from exc
 
@@ -273,6 +297,36 @@ def delete_note(note_id: str, uid: str) -> None:
         raise NoteStoreError(str(exc)) from exc
 
 
+def _note_matches_text(data: dict[str, Any], query_text: str) -> bool:
+    """Return whether lowercase ``query_text`` occurs in the note's searchable text.
+
+    Equivalent to searching title, content, keywords and trigger words joined
+    by spaces, but checks each field on its own first and only builds the
+    joined text when the query contains a space and could span two fields.
+    """
+
+    title = str(data.get("title") or "")
+    # Notes written before titleLower/contentLower existed lack them.
+    title_lower = data.get("titleLower")
+    if query_text in (title.lower() if title_lower is None else title_lower):
+        return True
+    content = str(data.get("content") or "")
+    content_lower = data.get("contentLower")
+    if content_lower is None or len(content) > _CONTENT_LOWER_MAX_CHARS:
+        content_lower = content.lower()
+    if query_text in content_lower:
+        return True
+    keywords = data.get("keywords") or _EMPTY
+    trigger_words = data.get("triggerWords") or _EMPTY
+    for word in (*keywords, *trigger_words):
+        if query_text in word.lower():
+            return True
+    if " " not in query_text:
+        return False
+    haystack = " ".join((title, content, " ".join(keywords), " ".join(trigger_words)))
+    return query_text in haystack.lower()
+
+
 def search_notes(
     uid: str,
     *,
@@ -292,17 +346,33 @@ def search_notes(
     scan_limit = min(max(limit * 3, limit), _MAX_SEARCH_SCAN)
 
     notes_col = _notes_collection()
-    base_query = notes_col.where("uid", "==", uid).order_by(
+    user_query = notes_col.where("uid", "==", uid)
+    # Firestore allows one array-contains-any filter per query, so push the
+    # trigger (or, failing that, keyword) terms to the server; the other set is
+    # still checked below.
+    if trigger_terms and len(trigger_terms) <= _MAX_ARRAY_CONTAINS_ANY:
+        user_query = user_query.where("triggerWordsLower", "array_contains_any", trigger_terms)
+    elif keyword_terms and len(keyword_terms) <= _MAX_ARRAY_CONTAINS_ANY:
+        user_query = user_query.where("keywordsLower", "array_contains_any", keyword_terms)
+    base_query = user_query.order_by(
         "updatedAt",
         direction=firebase_firestore.Query.DESCENDING,
     ).limit(scan_limit)
 
     try:
         documents = list(base_query.stream())
-    except google_exceptions.FailedPrecondition:
+    except google_exceptions.FailedPrecondition as exc:
         # If the order_by requires an index that does not exist yet, fall back to an
         # unordered scan. Firestore will raise FAILED_PRECONDITION with the index URL.
-        log.warning("Firestore index missing for notes search; falling back to unordered scan for uid %s", uid)
+        # Trigger lookups run on every chat message, so this is logged once.
+        global _missing_index_logged
+        if not _missing_index_logged:
+            _missing_index_logged = True
+            log.error(
+                "Firestore index missing for notes search; deploy firestore.indexes.json. "
+                "Falling back to an unordered scan that may miss notes: %s",
+                exc,
+            )
         try:
             documents = list(notes_col.where("uid", "==", uid).limit(scan_limit).stream())
         except (google_exceptions.PermissionDenied, google_exceptions.GoogleAPICallError) as exc:
@@ -317,25 +387,14 @@ def search_notes(
 
     for doc in documents:
         data = doc.to_dict() or {}
-        trigger_lower = set(data.get("triggerWordsLower") or [])
-        keywords_lower = set(data.get("keywordsLower") or [])
 
-        if trigger_set and not trigger_set.intersection(trigger_lower):
+        # isdisjoint stops at the first shared term and takes the stored lists as-is.
+        if trigger_set and trigger_set.isdisjoint(data.get("triggerWordsLower") or ()):
+            continue
+        if keyword_set and keyword_set.isdisjoint(data.get("keywordsLower") or ()):
             continue
-        if keyword_set and not keyword_set.intersection(keywords_lower):
+        if query_text and not _note_matches_text(data, query_text):
             continue
-        if query_text:
-            haystack = " ".join(
-                str(part or "")
-                for part in (
-                    data.get("title"),
-                    data.get("content"),
-                    " ".join(data.get("keywords") or []),
-                    " ".join(data.get("triggerWords") or []),
-                )
-            ).lower()
-            if query_text not in haystack:
-                continue
 
         data["id"] = doc.id
         results.append(data)
@@ -4,45 +4,44 @@ from datetime import datetime, timezone
 from typing import Any, Iterable
 import re
 
+# Runs of Unicode letters and digits ([^\W_]), optionally joined by single
+# apostrophes or hyphens. The joiner group is atomic so a failed suffix is not
+# retried character by character.
 TRIGGER_TOKEN_RE = re.compile(
-    r"[0-9A-Za-zÀ-ÖØ-öø-ÿ]+(?:['-][0-9A-Za-zÀ-ÖØ-öø-ÿ]+)*",
+    r"[^\W_]+(?>['-][^\W_]+)*",
     re.UNICODE,
 )
 DEFAULT_CONTEXT_CONTENT_LIMIT = 1200
+# Appended to note bodies cut at the context content limit.
+_TRUNCATION_MARK = "…"
+
+_UTC = timezone.utc
 
 __all__ = [
     "DEFAULT_CONTEXT_CONTENT_LIMIT",
     "extract_trigger_candidates",
     "format_note_for_context",
     "normalize_string_list",
+    "normalize_string_list_pair",
 ]
 
 
-def normalize_string_list(
-    values: Iterable[Any] | None,
-    *,
-    lowercase: bool = False,
-    max_items: int | None = None,
-) -> list[str]:
-    """Return a cleaned list of unique strings.
+def _collect_unique_strings(values: Iterable[Any] | None, max_items: int | None) -> dict[str, str]:
+    """Map each cleaned value's lowercase form to its first spelling, in order.
 
-    - Trims whitespace and ignores empty entries.
-    - Casts non-string values to strings when possible.
-    - Deduplicates values case-insensitively while preserving order.
-    - Optionally lowercases all results.
-    - Optionally truncates to ``max_items`` entries.
+    The dict is both the seen-set and the result, and callers pick keys or
+    values afterwards, so the loop does not depend on the output casing.
     """
 
     if values is None:
-        return []
+        return {}
 
     if isinstance(values, str):
         iterator: Iterable[Any] = [values]
     else:
         iterator = values
 
-    result: list[str] = []
-    seen: set[str] = set()
+    result: dict[str, str] = {}
 
     for raw in iterator:
         if raw is None:
@@ -57,12 +56,10 @@ def normalize_string_list(
             continue
 
         key = text.lower()
-        if key in seen:
+        if key in result:
             continue
 
-        seen.add(key)
-        normalized = key if lowercase else text
-        result.append(normalized)
+        result[key] = text
 
         if max_items is not None and len(result) >= max_items:
             break
@@ -70,6 +67,40 @@ def normalize_string_list(
     return result
 
 
+def normalize_string_list(
+    values: Iterable[Any] | None,
+    *,
+    lowercase: bool = False,
+    max_items: int | None = None,
+) -> list[str]:
+    """Return a cleaned list of unique strings.
+
+    - Trims whitespace and ignores empty entries.
+    - Casts non-string values to strings when possible.
+    - Deduplicates values case-insensitively while preserving order.
+    - Optionally lowercases all results.
+    - Optionally truncates to ``max_items`` entries.
+    """
+
+    result = _collect_unique_strings(values, max_items)
+    return list(result) if lowercase else list(result.values())
+
+
+def normalize_string_list_pair(
+    values: Iterable[Any] | None,
+    *,
+    max_items: int | None = None,
+) -> tuple[list[str], list[str]]:
+    """Return ``normalize_string_list`` results with and without lowercasing.
+
+    Both lists come from a single pass over ``values``, so one-shot iterables
+    are handled correctly and each entry is stripped and lowered only once.
+    """
+
+    result = _collect_unique_strings(values, max_items)
+    return list(result.values()), list(result)
+
+
 def extract_trigger_candidates(
     text: str | None,
     *,
@@ -78,19 +109,20 @@ def extract_trigger_candidates(
 ) -> list[str]:
     """Extract candidate trigger words from free-form text.
 
-    The function lowercases the text, tokenizes using ``TRIGGER_TOKEN_RE``,
+    The function tokenizes using ``TRIGGER_TOKEN_RE``, lowercases each token,
     filters out short tokens, and returns up to ``max_terms`` unique items
-    preserving the order in which they appeared.
+    preserving the order in which they appeared. Tokens are matched lazily,
+    so the rest of a long text is not scanned once enough terms are found.
     """
 
     if not text:
         return []
 
-    tokens = TRIGGER_TOKEN_RE.findall(text.lower())
     results: list[str] = []
     seen: set[str] = set()
 
-    for token in tokens:
+    for match in TRIGGER_TOKEN_RE.finditer(text):
+        token = match.group().lower()
         if len(token) < min_length:
             continue
         if token in seen:
@@ -107,12 +139,25 @@ def _format_timestamp(value: Any) -> str | None:
     if isinstance(value, str):
         return value
     if isinstance(value, datetime):
-        if value.tzinfo is None:
-            value = value.replace(tzinfo=timezone.utc)
-        return value.astimezone(timezone.utc).isoformat()
+        tzinfo = value.tzinfo
+        # Firestore timestamps are already UTC.
+        if tzinfo is None:
+            value = value.replace(tzinfo=_UTC)
+        elif tzinfo is not _UTC:
+            value = value.astimezone(_UTC)
+        return value.isoformat()
     return None
 
 
+def _join_terms(values: list[Any]) -> str:
+    # Stored keyword and trigger lists are normalized to strings on write, so
+    # join them as-is and only convert items for lists that hold other types.
+    try:
+        return ", ".join(values)
+    except TypeError:
+        return ", ".join(map(str, values))
+
+
 def format_note_for_context(
     note: dict[str, Any],
     *,
@@ -121,16 +166,17 @@ def format_note_for_context(
 ) -> str:
     """Format a note dictionary into a compact context block for the LLM."""
 
-    title = (note.get("title") or "New note").strip()
-    content = (note.get("content") or note.get("excerpt") or "").strip()
+    get = note.get
+    title = (get("title") or "").strip() or "New note"
+    content = (get("content") or get("excerpt") or "").strip()
 
     if content_limit and len(content) > content_limit:
-        content = f"{content[:content_limit].rstrip()}…"
+        content = content[:content_limit].rstrip() + _TRUNCATION_MARK
 
-    keywords = note.get("keywords") or []
-    trigger_words = note.get("triggerWords") or note.get("triggerwords") or []
+    keywords = get("keywords")
+    trigger_words = get("triggerWords") or get("triggerwords")
 
-    timestamp = _format_timestamp(note.get("updatedAt") or note.get("updated_at"))
+    timestamp = _format_timestamp(get("updatedAt") or get("updated_at"))
 
     lines: list[str] = [f"Stored note: {title}"]
     if include_metadata and timestamp:
@@ -138,8 +184,10 @@ def format_note_for_context(
     if content:
         lines.append(f"Body: {content}")
     if include_metadata and keywords:
-        lines.append(f"Keywords: {', '.join(str(k) for k in keywords)}")
+        lines.append(f"Keywords: {_join_terms(keywords)}")
     if include_metadata and trigger_words:
-        lines.append(f"Trigger words: {', '.join(str(t) for t in trigger_words)}")
+        lines.append(f"Trigger words: {_join_terms(trigger_words)}")
 
-    return "\n".join(lines).strip()
+    # Title and body are stripped above and stored keywords/trigger words are
+    # trimmed on write, so the joined block needs no further trimming.
+    return "\n".join(lines)
@@ -8,9 +8,11 @@ from flask import Blueprint, jsonify, request
 from firebase_admin import auth as firebase_auth
 from firebase_admin import exceptions as firebase_exceptions
 
+from ..auth.tokens import verify_id_token
 from .service import (
     UserProfileStoreError,
     get_user_profile,
+    get_user_profiles,
     serialize_user_profile,
     upsert_user_profile,
 )
@@ -18,6 +20,11 @@ from .service import (
 users_bp = Blueprint("users", __name__, url_prefix="/users")
 log = logging.getLogger(__name__)
 
+# Most uids accepted by one POST /users/batch request.
+MAX_BATCH_UIDS = 100
+# Firebase uids are at most 128 characters.
+MAX_UID_LENGTH = 128
+
 
 def _parse_json_body() -> dict[str, Any]:
     if request.is_json:
@@ -53,6 +60,81 @@ def get_profile(uid: str) -> tuple[Any, int]:
     return jsonify(serialize_user_profile(profile)), HTTPStatus.OK
 
 
+def _is_valid_uid(value: Any) -> bool:
+    # A "/" would address a different (or invalid) document path.
+    return isinstance(value, str) and 0 < len(value) <= MAX_UID_LENGTH and "/" not in value
+
+
+def _bearer_token() -> str | None:
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer":
+        return None
+    return token.strip() or None
+
+
+def _unauthorized(message: str):
+    return (
+        jsonify({"error": "unauthorized", "message": message}),
+        HTTPStatus.UNAUTHORIZED,
+    )
+
+
+@users_bp.post("/batch")
+def get_profiles() -> tuple[Any, int]:
+    id_token = _bearer_token()
+    if not id_token:
+        return _unauthorized("An Authorization: Bearer <idToken> header is required.")
+    try:
+        verify_id_token(id_token)
+    except firebase_exceptions.InvalidArgumentError:
+        # Covers expired and revoked tokens as well.
+        return _unauthorized("The provided ID token is invalid or expired.")
+    except firebase_exceptions.FirebaseError as exc:
+        return (
+            jsonify({"error": "firebase_error", "message": str(exc)}),
+            HTTPStatus.INTERNAL_SERVER_ERROR,
+        )
+
+    payload = _parse_json_body()
+    uids = payload.get("uids")
+    if not isinstance(uids, list) or not uids or not all(_is_valid_uid(uid) for uid in uids):
+        return (
+            jsonify({
+                "error": "validation_error",
+                "message": (
+                    "uids must be a non-empty list of user ids "
+                    f"(at most {MAX_UID_LENGTH} characters, no '/')."
+                ),
+            }),
+            HTTPStatus.BAD_REQUEST,
+        )
+    if len(uids) > MAX_BATCH_UIDS:
+        return (
+            jsonify({
+                "error": "validation_error",
+                "message": f"At most {MAX_BATCH_UIDS} uids can be requested at once.",
+            }),
+            HTTPStatus.BAD_REQUEST,
+        )
+
+    try:
+        profiles = get_user_profiles(uids)
+    except UserProfileStoreError as exc:
+        log.exception("Failed to fetch %d profiles", len(uids))
+        return _profile_error_response(str(exc))
+
+    # Profiles come back in request order; uids without a profile are skipped.
+    # Email addresses are left out so the endpoint cannot be used to collect them.
+    items = []
+    for uid in dict.fromkeys(uids):
+        profile = profiles.get(uid)
+        if profile is not None:
+            item = serialize_user_profile(profile)
+            del item["email"]
+            items.append(item)
+    return jsonify({"items": items}), HTTPStatus.OK
+
+
 @users_bp.patch("/<uid>")
 def update_profile(uid: str) -> tuple[Any, int]:
     payload = _parse_json_body()
@@ -1,25 +1,49 @@
 from __future__ import annotations
 
 from datetime import datetime, timezone
-from typing import Any, Optional
+from typing import Any, Iterable, Optional
 import logging
 
 from firebase_admin import firestore as firebase_firestore
 from google.api_core import exceptions as google_exceptions
 
-from ..firebase import get_firestore_client
+from ..firebase import get_collection, get_firestore_client
 
 log = logging.getLogger(__name__)
 
+_UTC = timezone.utc
+
+_USERS_COLLECTION = "users"
+
 
 class UserProfileStoreError(Exception):
     """Raised when a user profile cannot be persisted to Firestore."""
 
 
+def _users_collection():
+    return get_collection(_USERS_COLLECTION)
+
+
 def _clean_payload(payload: dict[str, Any]) -> dict[str, Any]:
     return {key: value for key, value in payload.items() if value is not None}
 
 
+@firebase_firestore.transactional
+def _merge_profile(transaction, doc_ref, updates: dict[str, Any]) -> tuple[dict[str, Any], bool]:
+    """Merge ``updates`` into the profile, adding ``createdAt`` for new ones.
+
+    Returns the profile as stored before the write and whether it was created.
+    """
+
+    # to_dict() is None exactly when the document does not exist.
+    stored = doc_ref.get(transaction=transaction).to_dict()
+    created = stored is None
+    if created:
+        updates = {**updates, "createdAt": firebase_firestore.SERVER_TIMESTAMP}
+    transaction.set(doc_ref, updates, merge=True)
+    return stored or {}, created
+
+
 def upsert_user_profile(
     uid: str,
     *,
@@ -31,44 +55,38 @@ def upsert_user_profile(
     """Create or update a Firestore-backed user profile."""
 
     db = get_firestore_client()
-    doc_ref = db.collection("users").document(uid)
+    doc_ref = _users_collection().document(uid)
 
-    try:
-        snapshot = doc_ref.get()
-    except (google_exceptions.PermissionDenied, google_exceptions.GoogleAPICallError) as exc:
-        raise UserProfileStoreError(str(exc)) from exc
-
-    timestamp_value = firebase_firestore.SERVER_TIMESTAMP
     updates: dict[str, Any] = {
-        "updatedAt": timestamp_value,
+        "updatedAt": firebase_firestore.SERVER_TIMESTAMP,
     }
-    if not snapshot.exists:
-        updates["createdAt"] = timestamp_value
-
-    updates.update(
-        _clean_payload(
-            {
-                "email": email,
-                "displayName": display_name,
-                "photoUrl": photo_url,
-            }
-        )
-    )
+
+    if email is not None:
+        updates["email"] = email
+    if display_name is not None:
+        updates["displayName"] = display_name
+    if photo_url is not None:
+        updates["photoUrl"] = photo_url
 
     if extra_fields:
         updates.update(_clean_payload(extra_fields))
 
+    # The existence check and the write share one transaction, and the merged
+    # profile is built locally instead of being read back.
     try:
-        doc_ref.set(updates, merge=True)
+        data, created = _merge_profile(db.transaction(), doc_ref, updates)
     except (google_exceptions.PermissionDenied, google_exceptions.GoogleAPICallError) as exc:
         raise UserProfileStoreError(str(exc)) from exc
-
-    try:
-        final_snapshot = doc_ref.get()
-    except (google_exceptions.PermissionDenied, google_exceptions.GoogleAPICallError) as exc:
+    except ValueError as exc:
+        # Raised once the transaction has been retried too often on contention.
         raise UserProfileStoreError(str(exc)) from exc
 
-    data = final_snapshot.to_dict() or {}
+    # Firestore stores server timestamps; the response uses the local clock.
+    now = datetime.now(_UTC)
+    data.update(updates)
+    data["updatedAt"] = now
+    if created:
+        data["createdAt"] = now
     data["uid"] = uid
     return data
 
@@ -76,30 +94,63 @@ def upsert_user_profile(
 def get_user_profile(uid: str) -> Optional[dict[str, Any]]:
     """Fetch a stored user profile from Firestore."""
 
-    db = get_firestore_client()
-    doc_ref = db.collection("users").document(uid)
+    doc_ref = _users_collection().document(uid)
 
     try:
         snapshot = doc_ref.get()
     except (google_exceptions.PermissionDenied, google_exceptions.GoogleAPICallError) as exc:
         raise UserProfileStoreError(str(exc)) from exc
 
-    if not snapshot.exists:
+    data = snapshot.to_dict()
+    if data is None:
         return None
 
-    data = snapshot.to_dict() or {}
     data["uid"] = uid
     return data
 
 
-def serialize_user_profile(data: dict[str, Any]) -> dict[str, Any]:
-    def _to_iso(value: Any) -> Any:
-        if isinstance(value, datetime):
-            if value.tzinfo is None:
-                value = value.replace(tzinfo=timezone.utc)
-            return value.astimezone(timezone.utc).isoformat()
-        return value
+def _to_iso(value: Any) -> Any:
+    if isinstance(value, datetime):
+        tzinfo = value.tzinfo
+        # Firestore timestamps are already UTC.
+        if tzinfo is _UTC:
+            return value.isoformat()
+        if tzinfo is None:
+            return value.replace(tzinfo=_UTC).isoformat()
+        return value.astimezone(_UTC).isoformat()
+    return value
+
+
+def get_user_profiles(uids: Iterable[str]) -> dict[str, dict[str, Any]]:
+    """Fetch several stored user profiles in one Firestore round-trip.
+
+    Returns the profiles keyed by uid; uids without a profile are left out.
+    """
+
+    users_col = _users_collection()
+    try:
+        refs = [users_col.document(uid) for uid in dict.fromkeys(uids)]
+    except ValueError as exc:
+        # The client rejects ids that do not form a valid document path.
+        raise UserProfileStoreError(str(exc)) from exc
+    if not refs:
+        return {}
+
+    profiles: dict[str, dict[str, Any]] = {}
+    try:
+        for snapshot in get_firestore_client().get_all(refs):
+            data = snapshot.to_dict()
+            if data is None:
+                continue
+            data["uid"] = snapshot.id
+            profiles[snapshot.id] = data
+    except (google_exceptions.PermissionDenied, google_exceptions.GoogleAPICallError) as exc:
+        raise UserProfileStoreError(str(exc)) from exc
+
+    return profiles
 
+
+def serialize_user_profile(data: dict[str, Any]) -> dict[str, Any]:
     return {
         "uid": data.get("uid"),
         "email": data.get("email"),
@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+from flask import Request as _FlaskRequest
+
+
+class Request(_FlaskRequest):
+    """Request whose body size limit can be changed from inside a view.
+
+    Flask 3.0 only exposes ``MAX_CONTENT_LENGTH`` read-only, so every route
+    shares one limit. Assigning ``request.max_content_length`` before the body
+    is read overrides it for that request alone (the same API Flask 3.1 adds).
+    """
+
+    _max_content_length: int | None = None
+
+    @property
+    def max_content_length(self) -> int | None:  # type: ignore[override]
+        if self._max_content_length is not None:
+            return self._max_content_length
+        return super().max_content_length
+
+    @max_content_length.setter
+    def max_content_length(self, value: int | None) -> None:
+        self._max_content_length = value